@@ -0,0 +1,155 @@
+"""Maintenance commands.
+
+    python -m app.cli rollup rebuild [--user-id UUID]
+    python -m app.cli rollup check [--user-id UUID]
+    python -m app.cli streak rebuild [--user-id UUID]
+    python -m app.cli streak check [--user-id UUID]
+    python -m app.cli records rebuild [--user-id UUID]
+    python -m app.cli records check [--user-id UUID]
+"""
+import argparse
+import asyncio
+import sys
+from datetime import date
+from uuid import UUID
+
+from sqlalchemy import select
+
+from app.db.database import AsyncSessionLocal, async_engine
+from app.models.user import User
+from app.models.workout import Workout
+from app.services.records import RECORD_COLUMNS, check_records, rebuild_records
+from app.services.rollup import rebuild_rollup, check_rollup
+from app.services.streak import compute_streak, current_streak, get_streak_state, recompute_streak
+
+
+async def rollup_rebuild(args: argparse.Namespace) -> int:
+    async with AsyncSessionLocal() as db:
+        rows = await rebuild_rollup(db, args.user_id)
+        await db.commit()
+    print(f"Rebuilt daily_stats: {rows} rows")
+    return 0
+
+
+async def rollup_check(args: argparse.Namespace) -> int:
+    async with AsyncSessionLocal() as db:
+        mismatches = await check_rollup(db, args.user_id)
+    for m in mismatches:
+        print(
+            f"{m['user_id']} {m['date']} {m['muscle_group'].value}: "
+            f"exercise_count {m['actual_exercise_count']} != {m['expected_exercise_count']}, "
+            f"volume {m['actual_volume']} != {m['expected_volume']}, "
+            f"tonnage {m['actual_tonnage']} != {m['expected_tonnage']}"
+        )
+    print(f"{len(mismatches)} mismatched rows")
+    return 1 if mismatches else 0
+
+
+async def records_rebuild(args: argparse.Namespace) -> int:
+    async with AsyncSessionLocal() as db:
+        rows = await rebuild_records(db, args.user_id)
+        await db.commit()
+    print(f"Rebuilt personal_records: {rows} rows")
+    return 0
+
+
+async def records_check(args: argparse.Namespace) -> int:
+    async with AsyncSessionLocal() as db:
+        mismatches = await check_records(db, args.user_id)
+    for m in mismatches:
+        fields = ", ".join(
+            f"{name} {m[f'actual_{name}']} != {m[f'expected_{name}']}"
+            for name in RECORD_COLUMNS[2:]
+            if m[f"actual_{name}"] != m[f"expected_{name}"]
+        )
+        print(f"{m['user_id']} {m['exercise_key']!r}: {fields}")
+    print(f"{len(mismatches)} mismatched records")
+    return 1 if mismatches else 0
+
+
+async def _user_ids(db, user_id):
+    if user_id is not None:
+        return [user_id]
+    return (await db.scalars(select(User.id))).all()
+
+
+async def streak_rebuild(args: argparse.Namespace) -> int:
+    async with AsyncSessionLocal() as db:
+        user_ids = await _user_ids(db, args.user_id)
+        for user_id in user_ids:
+            await recompute_streak(db, user_id)
+        await db.commit()
+    print(f"Rebuilt streak state for {len(user_ids)} users")
+    return 0
+
+
+async def streak_check(args: argparse.Namespace) -> int:
+    """Compare persisted streaks with the reference date walk"""
+    today = date.today()
+    mismatches = 0
+    async with AsyncSessionLocal() as db:
+        for user_id in await _user_ids(db, args.user_id):
+            dates = await db.scalars(select(Workout.date).where(Workout.user_id == user_id))
+            expected = compute_streak(dates, today)
+            state = await get_streak_state(db, user_id, persist=False)
+            actual = {
+                "current_streak": current_streak(state, today),
+                "longest_streak": state.longest_streak,
+            }
+            if actual["current_streak"] is None:
+                actual["current_streak"] = expected["current_streak"]
+            if actual != expected:
+                mismatches += 1
+                print(f"{user_id}: {actual} != {expected}")
+    print(f"{mismatches} mismatched users")
+    return 1 if mismatches else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rollup = commands.add_parser("rollup", help="daily_stats rollup table")
+    rollup_commands = rollup.add_subparsers(dest="action", required=True)
+    rebuild = rollup_commands.add_parser("rebuild", help="backfill the rollup from workouts/exercises")
+    rebuild.add_argument("--user-id", type=UUID, default=None)
+    rebuild.set_defaults(handler=rollup_rebuild)
+    check = rollup_commands.add_parser("check", help="compare the rollup with workouts/exercises")
+    check.add_argument("--user-id", type=UUID, default=None)
+    check.set_defaults(handler=rollup_check)
+
+    streak = commands.add_parser("streak", help="persisted workout streaks")
+    streak_commands = streak.add_subparsers(dest="action", required=True)
+    rebuild = streak_commands.add_parser("rebuild", help="recompute streak state from workouts")
+    rebuild.add_argument("--user-id", type=UUID, default=None)
+    rebuild.set_defaults(handler=streak_rebuild)
+    check = streak_commands.add_parser("check", help="compare streak state with the reference computation")
+    check.add_argument("--user-id", type=UUID, default=None)
+    check.set_defaults(handler=streak_check)
+
+    records = commands.add_parser("records", help="personal_records table")
+    records_commands = records.add_subparsers(dest="action", required=True)
+    rebuild = records_commands.add_parser("rebuild", help="recompute personal records from workouts/exercises")
+    rebuild.add_argument("--user-id", type=UUID, default=None)
+    rebuild.set_defaults(handler=records_rebuild)
+    check = records_commands.add_parser("check", help="compare personal records with workouts/exercises")
+    check.add_argument("--user-id", type=UUID, default=None)
+    check.set_defaults(handler=records_check)
+
+    return parser
+
+
+async def run(args: argparse.Namespace) -> int:
+    try:
+        return await args.handler(args)
+    finally:
+        await async_engine.dispose()
+
+
+def main() -> None:
+    args = build_parser().parse_args()
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""Admission control for expensive route classes.
+
+Each request to a limited route class (auth, stats, writes) is admitted in
+two steps, before the endpoint opens a database session or hashes a
+password:
+
+- a token bucket per client and class: `rate` requests per second with
+  bursts of up to `burst`. A client over its rate gets 429 with the seconds
+  until its next token in Retry-After. Auth requests take a token from two
+  buckets: one per client address and email, and a looser one per address
+  (auth_address), so one address cannot try email after email;
+- a cap on requests of the class in flight in this process. Over the cap,
+  requests get 503 with Retry-After: 1 straight away instead of queueing
+  for the connection pool or the hash workers.
+
+The caps are always per process, like the pools and workers they protect.
+The buckets are per process with the memory backend, so each worker allows
+the full rate, or shared by all workers with ADMISSION_BACKEND=redis. A
+shared backend that cannot be reached admits the request and logs a
+warning: an unavailable limiter should not take the API down with it.
+"""
+import logging
+import math
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, Iterator, Tuple
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.metrics import ADMISSION_IN_FLIGHT, ADMISSION_REJECTIONS
+
+logger = logging.getLogger(__name__)
+
+ROUTE_CLASSES = ("auth", "stats", "writes")
+
+
+class AdmissionRejected(Exception):
+    """A request refused by a rate limit or concurrency cap"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class RateLimiter(ABC):
+    """Token buckets keyed by string"""
+
+    @abstractmethod
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        """Take a token from key's bucket: 0 if admitted, else seconds until one is available"""
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryRateLimiter(RateLimiter):
+    """Buckets in a process-local TTLCache; also the stand-in for redis in tests.
+
+    A bucket is dropped once it would have refilled, so only clients that
+    used it recently take memory. Buckets evicted from a full cache start
+    full again, which errs towards admitting.
+    """
+
+    def __init__(self, maxsize: int = 100_000):
+        self._buckets = TTLCache(maxsize=maxsize, ttl=3600)
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key) or (burst, now)
+        tokens = min(burst, tokens + (now - updated) * rate)
+        if tokens < 1:
+            return (1 - tokens) / rate
+        tokens -= 1
+        self._buckets.set(key, (tokens, now), ttl=(burst - tokens) / rate)
+        return 0.0
+
+
+# One round trip, atomic, on the server's clock so workers' clocks need not agree
+TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+if tokens < 1 then
+    return tostring((1 - tokens) / rate)
+end
+tokens = tokens - 1
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((burst - tokens) / rate * 1000) + 1000)
+return '0'
+"""
+
+
+class RedisRateLimiter(RateLimiter):
+    """Buckets shared by every worker using the same redis; needs the redis package"""
+
+    def __init__(self, client, prefix: str = "admission:"):
+        self._client = client
+        self._prefix = prefix
+        self._take = client.register_script(TAKE_SCRIPT)
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisRateLimiter":
+        import redis.asyncio
+
+        return cls(redis.asyncio.from_url(url, socket_timeout=0.25, socket_connect_timeout=0.25))
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        return float(await self._take(keys=[self._prefix + key], args=[rate, burst]))
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+@lru_cache
+def rate_limiter() -> RateLimiter:
+    if settings.ADMISSION_BACKEND == "redis":
+        if not settings.ADMISSION_REDIS_URL:
+            raise RuntimeError("ADMISSION_BACKEND=redis needs ADMISSION_REDIS_URL")
+        return RedisRateLimiter.from_url(settings.ADMISSION_REDIS_URL)
+    return MemoryRateLimiter()
+
+
+async def close_rate_limiter() -> None:
+    if rate_limiter.cache_info().currsize:
+        await rate_limiter().close()
+        rate_limiter.cache_clear()
+
+
+def _rate_limits(bucket: str) -> Tuple[float, int]:
+    prefix = f"ADMISSION_{bucket.upper()}"
+    return getattr(settings, f"{prefix}_RATE"), getattr(settings, f"{prefix}_BURST")
+
+
+# Requests in flight per route class; only touched from the event loop thread
+_in_flight: Dict[str, int] = dict.fromkeys(ROUTE_CLASSES, 0)
+
+
+async def check_rate(bucket: str, client: str) -> None:
+    """Raise AdmissionRejected (429) if client is over the bucket's rate.
+
+    bucket is a route class, or auth_address for the limit per client
+    address that auth requests pass as well as their own.
+    """
+    rate, burst = _rate_limits(bucket)
+    if rate <= 0:
+        return
+    limiter = rate_limiter()
+    try:
+        wait = await limiter.take(f"{bucket}:{client}", rate, max(burst, 1))
+    except Exception:
+        logger.warning("Rate limiter unavailable; admitting %s request", bucket, exc_info=True)
+        return
+    if wait > 0:
+        ADMISSION_REJECTIONS.labels(bucket, "rate").inc()
+        raise AdmissionRejected(429, "Too many requests, please retry later", math.ceil(wait))
+
+
+@contextmanager
+def concurrency_slot(route_class: str) -> Iterator[None]:
+    """Hold one of the class's in-flight slots, or raise AdmissionRejected (503)"""
+    limit = getattr(settings, f"ADMISSION_{route_class.upper()}_CONCURRENCY")
+    if limit > 0 and _in_flight[route_class] >= limit:
+        ADMISSION_REJECTIONS.labels(route_class, "concurrency").inc()
+        raise AdmissionRejected(503, "Server is busy, please retry", 1)
+    _in_flight[route_class] += 1
+    ADMISSION_IN_FLIGHT.labels(route_class).inc()
+    try:
+        yield
+    finally:
+        _in_flight[route_class] -= 1
+        ADMISSION_IN_FLIGHT.labels(route_class).dec()
+
@@ -0,0 +1,139 @@
+"""Response compression.
+
+A complete response (one body message, which is what every JSON endpoint
+sends) of at least COMPRESSION_MIN_SIZE bytes is compressed with the
+encoding the client accepts most, ties going to the first one in
+COMPRESSION_ENCODINGS. These responses are left as they are:
+
+- streamed responses (the NDJSON/CSV export), so their chunks still reach
+  the client as they are produced;
+- responses that already have a Content-Encoding;
+- responses other than text and JSON;
+- bodies under the threshold, where the encoding overhead outweighs the
+  saving.
+
+gzip is always available. br and zstd need the optional brotli and
+zstandard packages and are skipped without them.
+"""
+import gzip
+from functools import lru_cache
+from typing import Callable, Dict, Tuple
+
+from starlette.datastructures import MutableHeaders
+
+from app.core.config import settings
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson")
+
+Encoder = Callable[[bytes], bytes]
+
+
+@lru_cache
+def encoders(names: str, gzip_level: int, brotli_quality: int, zstd_level: int) -> Dict[str, Encoder]:
+    """Encoders for a COMPRESSION_ENCODINGS value, in its order, skipping unavailable ones"""
+    available: Dict[str, Encoder] = {}
+    for name in (name.strip().lower() for name in names.split(",")):
+        if name == "gzip":
+            # mtime=0 keeps the output identical for identical bodies
+            available[name] = lambda body: gzip.compress(body, compresslevel=gzip_level, mtime=0)
+        elif name == "br" and brotli is not None:
+            available[name] = lambda body: brotli.compress(body, quality=brotli_quality)
+        elif name == "zstd" and zstandard is not None:
+            available[name] = zstandard.ZstdCompressor(level=zstd_level).compress
+    return available
+
+
+def configured_encoders() -> Dict[str, Encoder]:
+    return encoders(
+        settings.COMPRESSION_ENCODINGS,
+        settings.COMPRESSION_GZIP_LEVEL,
+        settings.COMPRESSION_BROTLI_QUALITY,
+        settings.COMPRESSION_ZSTD_LEVEL,
+    )
+
+
+@lru_cache(maxsize=256)
+def choose_encoding(accept_encoding: str, offered: Tuple[str, ...]):
+    """The offered encoding with the highest q-value in Accept-Encoding, or None"""
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[name.strip().lower()] = q
+    wildcard = accepted.get("*", 0.0)
+    best, best_q = None, 0.0
+    for name in offered:
+        q = accepted.get(name, wildcard)
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+class CompressionMiddleware:
+    """Compresses complete text and JSON responses over the size threshold"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        available = configured_encoders()
+        accept_encoding = next((v for k, v in scope["headers"] if k == b"accept-encoding"), b"")
+        encoding = None
+        if available and accept_encoding:
+            encoding = choose_encoding(accept_encoding.decode("latin-1"), tuple(available))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        minimum_size = settings.COMPRESSION_MIN_SIZE
+        start = None
+
+        async def send_wrapper(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                # Held back until the first body message shows whether the
+                # response is complete
+                start = message
+                return
+            if start is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            response_start, start = start, None
+            headers = MutableHeaders(raw=response_start["headers"])
+            if (
+                not message.get("more_body", False)
+                and "content-encoding" not in headers
+                and headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+            ):
+                headers.add_vary_header("Accept-Encoding")
+                body = message.get("body", b"")
+                if len(body) >= minimum_size:
+                    body = available[encoding](body)
+                    headers["Content-Encoding"] = encoding
+                    headers["Content-Length"] = str(len(body))
+                    message = {**message, "body": body}
+            await send(response_start)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
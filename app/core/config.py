@@ -1,14 +1,94 @@
+from functools import lru_cache
+from typing import Literal, Optional
+
 from pydantic_settings import BaseSettings
 
 
 class Settings(BaseSettings):
     DATABASE_URL: str
+    ASYNC_DATABASE_URL: Optional[str] = None  # defaults to DATABASE_URL with asyncpg
+    # Optional streaming replica for read-only GET endpoints (same URL form as DATABASE_URL)
+    READ_REPLICA_URL: Optional[str] = None
+    # Connection pool, per engine and per process
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = False  # costs a round trip per checkout
+    # Server-side statement_timeout for every connection (0 disables)
+    DB_STATEMENT_TIMEOUT_MS: int = 30000
+    # Connections each engine opens at startup, before the first request
+    DB_POOL_WARMUP: int = 0
+    # create_all at startup, for throwaway databases; real ones use Alembic
+    DB_CREATE_SCHEMA: bool = False
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
+    # bcrypt cost; stored hashes are upgraded on the next successful login
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
+    # Hash/verify calls allowed in flight before register/login answer 503
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    # Workouts written per INSERT batch/commit by the bulk import endpoint
+    IMPORT_BATCH_SIZE: int = 500
+    # In-process cache of decoded tokens and authenticated users (0 disables)
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_TTL_SECONDS: int = 60
+    # Cached /stats/timeseries results; entries are keyed by data version, so the TTL only bounds memory
+    TIMESERIES_CACHE_SIZE: int = 1000
+    TIMESERIES_CACHE_TTL_SECONDS: int = 3600
+    # Cached /workouts/calendar results, keyed by data version like the timeseries
+    CALENDAR_CACHE_SIZE: int = 1000
+    CALENDAR_CACHE_TTL_SECONDS: int = 3600
+    # Encode list responses with orjson instead of validating through response_model
+    FAST_JSON_RESPONSES: bool = True
+    # Response compression, in server preference order; br and zstd are skipped
+    # unless brotli/zstandard are installed, and an empty value disables it
+    COMPRESSION_ENCODINGS: str = "zstd,br,gzip"
+    # Bodies smaller than this many bytes are sent uncompressed
+    COMPRESSION_MIN_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6  # 1-9
+    COMPRESSION_BROTLI_QUALITY: int = 4  # 0-11
+    COMPRESSION_ZSTD_LEVEL: int = 3  # 1-22
+    # Admission control for auth, stats and write endpoints (app/core/admission.py).
+    # Rates are requests per second per user (per client address and email for
+    # auth), with bursts up to BURST; concurrency is requests in flight per
+    # process. 0 disables
+    ADMISSION_AUTH_RATE: float = 1
+    ADMISSION_AUTH_BURST: int = 10
+    ADMISSION_AUTH_CONCURRENCY: int = 32
+    # Auth requests from one client address, whatever email they name
+    ADMISSION_AUTH_ADDRESS_RATE: float = 5
+    ADMISSION_AUTH_ADDRESS_BURST: int = 50
+    ADMISSION_STATS_RATE: float = 5
+    ADMISSION_STATS_BURST: int = 30
+    ADMISSION_STATS_CONCURRENCY: int = 16
+    ADMISSION_WRITES_RATE: float = 5
+    ADMISSION_WRITES_BURST: int = 30
+    ADMISSION_WRITES_CONCURRENCY: int = 16
+    # Where the rate limits are kept: per process, or in redis, shared by all workers
+    ADMISSION_BACKEND: Literal["memory", "redis"] = "memory"
+    ADMISSION_REDIS_URL: Optional[str] = None
+    # Per-endpoint SQL statement budgets: off in production, log in staging, raise in tests
+    QUERY_BUDGET_MODE: Literal["off", "log", "raise"] = "off"
 
     class Config:
         env_file = ".env"
 
 
-settings = Settings()
+@lru_cache
+def get_settings() -> Settings:
+    return Settings()
+
+
+class _LazySettings:
+    """Reads the environment on first attribute access instead of at import"""
+
+    def __getattr__(self, name):
+        return getattr(get_settings(), name)
+
+    def __setattr__(self, name, value):
+        setattr(get_settings(), name, value)
+
+
+settings = _LazySettings()
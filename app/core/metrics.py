@@ -0,0 +1,180 @@
+"""Prometheus metrics for requests, SQL statements and the connection pool.
+
+MetricsMiddleware times every HTTP request under its route template
+(``/api/workouts/{workout_id}``, not the raw path) and tracks requests in
+flight. Engine hooks installed by ``instrument_engine`` count and time each
+statement. The time is credited to the request in progress through a
+context variable, so every route gets a statements-per-request and
+SQL-seconds-per-request histogram. TimedQueuePool records how long a
+checkout waits for a connection.
+
+Metrics are per process; with several workers, Prometheus should scrape
+each one.
+"""
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.cache import TTLCache
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time to send the full response", ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+REQUESTS = Counter("http_requests", "Responses sent", ["method", "route", "status"])
+IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being handled")
+REQUEST_STATEMENTS = Histogram(
+    "http_request_db_statements", "SQL statements executed per request", ["method", "route"],
+    buckets=(0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 50, 100),
+)
+REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds", "Time spent executing SQL per request", ["method", "route"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+STATEMENT_DURATION = Histogram(
+    "db_statement_duration_seconds", "Duration of individual SQL statements",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+)
+POOL_CHECKOUT = Histogram(
+    "db_pool_checkout_seconds", "Time to obtain a pooled connection, including waiting for one",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+)
+
+ADMISSION_REJECTIONS = Counter(
+    "admission_rejections", "Requests refused by admission control", ["route_class", "reason"]
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    "admission_in_flight", "Admitted requests in progress", ["route_class"]
+)
+
+
+@dataclass
+class RequestStats:
+    statements: int = 0
+    db_seconds: float = 0.0
+
+
+# SQL statistics of the request being handled in the current task
+request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+class MetricsMiddleware:
+    """Plain ASGI middleware; unlike BaseHTTPMiddleware it does not buffer streaming bodies"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            IN_FLIGHT.dec()
+            request_stats.reset(token)
+            route = scope.get("route")
+            labels = (scope["method"], route.path if route is not None else UNMATCHED_ROUTE)
+            REQUEST_DURATION.labels(*labels).observe(elapsed)
+            REQUESTS.labels(*labels, str(status_code)).inc()
+            REQUEST_STATEMENTS.labels(*labels).observe(stats.statements)
+            REQUEST_DB_SECONDS.labels(*labels).observe(stats.db_seconds)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["metrics_started"].pop()
+    STATEMENT_DURATION.observe(elapsed)
+    stats = request_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_seconds += elapsed
+
+
+def instrument_engine(engine: Engine, name: str = "primary") -> None:
+    """Time statements and export pool gauges for an engine.
+
+    Takes a sync Engine; pass ``async_engine.sync_engine`` for an async one.
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    _engines[name] = engine
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records how long each checkout takes"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_CHECKOUT.observe(time.perf_counter() - started)
+
+
+_engines: Dict[str, Engine] = {}
+_caches: Dict[str, TTLCache] = {}
+
+
+def register_cache(name: str, cache: TTLCache) -> None:
+    """Export a TTLCache's hit/miss counters and size"""
+    _caches[name] = cache
+
+
+class _ScrapeTimeCollector:
+    """Values read when /metrics is scraped rather than kept up to date"""
+
+    def collect(self):
+        checked_out = GaugeMetricFamily("db_pool_checked_out", "Connections in use", labels=["engine"])
+        idle = GaugeMetricFamily("db_pool_idle", "Idle connections held by the pool", labels=["engine"])
+        overflow = GaugeMetricFamily("db_pool_overflow", "Connections opened beyond pool_size", labels=["engine"])
+        for name, engine in _engines.items():
+            pool = engine.pool
+            if isinstance(pool, QueuePool):
+                checked_out.add_metric([name], pool.checkedout())
+                idle.add_metric([name], pool.checkedin())
+                overflow.add_metric([name], max(pool.overflow(), 0))
+        yield from (checked_out, idle, overflow)
+
+        hits = CounterMetricFamily("cache_hits", "Cache lookups that found a live entry", labels=["cache"])
+        misses = CounterMetricFamily("cache_misses", "Cache lookups that missed", labels=["cache"])
+        size = GaugeMetricFamily("cache_entries", "Entries currently cached", labels=["cache"])
+        for name, cache in _caches.items():
+            stats = cache.stats()
+            hits.add_metric([name], stats["hits"])
+            misses.add_metric([name], stats["misses"])
+            size.add_metric([name], stats["size"])
+        yield from (hits, misses, size)
+
+
+REGISTRY.register(_ScrapeTimeCollector())
+
+
+def render_metrics() -> bytes:
+    return generate_latest(REGISTRY)
@@ -0,0 +1,20 @@
+import base64
+from datetime import date
+from typing import Tuple
+from uuid import UUID
+
+
+def encode_cursor(cursor_date: date, cursor_id: UUID) -> str:
+    """Encode a (date, id) keyset position as an opaque URL-safe token"""
+    raw = f"{cursor_date.isoformat()}|{cursor_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[date, UUID]:
+    """Decode a token from encode_cursor; raises ValueError if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        cursor_date, cursor_id = raw.split("|")
+        return date.fromisoformat(cursor_date), UUID(cursor_id)
+    except (UnicodeDecodeError, TypeError, ValueError) as exc:
+        raise ValueError("Invalid cursor") from exc
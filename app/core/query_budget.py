@@ -0,0 +1,150 @@
+"""Per-endpoint limits on the number of SQL statements.
+
+Endpoints declare how many statements a request may issue:
+
+    @router.get("")
+    @query_budget(3)
+    async def get_workouts(...):
+
+The count covers the whole request, dependencies included. Budgets are
+checked only when QUERY_BUDGET_MODE is set:
+
+- ``off``: no hooks are installed and the decorator only tags the function;
+- ``log``: for staging; over-budget requests log every statement they ran,
+  each with the application frames that issued it;
+- ``raise``: for tests; the statement that goes over budget raises
+  QueryBudgetExceeded instead of running, so the traceback points at the
+  extra query.
+
+``count_queries`` applies the same accounting to a block of code outside a
+request, such as a test or a script (statements are only seen when the mode
+is not ``off``):
+
+    with count_queries(budget=2) as log:
+        await attach_exercises(db, workouts)
+    assert len(log.statements) == 1
+
+Blocks nest: statements inside a block count against that block only, not
+against the request or block around it. The bulk import uses this to
+budget each batch it writes.
+"""
+import logging
+import os
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Only frames from the app package are kept in recorded stacks
+_APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+@dataclass
+class QueryLog:
+    budget: Optional[int] = None
+    label: str = "block"
+    scope: Optional[dict] = None
+    statements: List[Tuple[str, List[str]]] = field(default_factory=list)
+
+    def resolve_budget(self) -> Optional[int]:
+        # The route is only known once routing has run, which is before
+        # any dependency or endpoint can issue a statement
+        if self.budget is None and self.scope is not None:
+            route = self.scope.get("route")
+            if route is not None:
+                self.budget = getattr(route.endpoint, "query_budget", None)
+                self.label = f"{self.scope['method']} {route.path}"
+        return self.budget
+
+    def report(self) -> str:
+        lines = [f"{self.label} ran {len(self.statements)} SQL statements, budget {self.budget}"]
+        for number, (statement, stack) in enumerate(self.statements, 1):
+            marker = "  <-- over budget" if self.budget is not None and number > self.budget else ""
+            lines.append(f"[{number}] {' '.join(statement.split())}{marker}")
+            lines.extend(f"      {frame}" for frame in stack)
+        return "\n".join(lines)
+
+
+_current: ContextVar[Optional[QueryLog]] = ContextVar("query_budget", default=None)
+
+
+def query_budget(max_queries: int) -> Callable:
+    """Declare the most SQL statements one request to this endpoint may run"""
+    def decorate(endpoint: Callable) -> Callable:
+        endpoint.query_budget = max_queries
+        return endpoint
+    return decorate
+
+
+def _app_frames() -> List[str]:
+    return [
+        f"{os.path.relpath(frame.filename, _APP_ROOT)}:{frame.lineno} in {frame.name}"
+        for frame in traceback.extract_stack()
+        if frame.filename.startswith(_APP_ROOT) and not frame.filename.endswith("query_budget.py")
+    ]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    log = _current.get()
+    if log is None:
+        return
+    log.statements.append((statement, _app_frames()))
+    budget = log.resolve_budget()
+    if settings.QUERY_BUDGET_MODE == "raise" and budget is not None and len(log.statements) > budget:
+        raise QueryBudgetExceeded(log.report())
+
+
+def install(engine: Engine) -> None:
+    """Start counting statements on an engine if QUERY_BUDGET_MODE is not off"""
+    if settings.QUERY_BUDGET_MODE != "off":
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+
+
+def _check(log: QueryLog) -> None:
+    if log.budget is not None and len(log.statements) > log.budget:
+        # raise mode already raised at the offending statement unless the
+        # caller swallowed it, so logging covers both modes here
+        logger.warning("Query budget exceeded: %s", log.report())
+
+
+@contextmanager
+def count_queries(budget: Optional[int] = None, label: str = "block") -> Iterator[QueryLog]:
+    """Record the statements run inside the block, enforcing budget if given"""
+    log = QueryLog(budget=budget, label=label)
+    token = _current.set(log)
+    try:
+        yield log
+    finally:
+        _current.reset(token)
+    _check(log)
+
+
+class QueryBudgetMiddleware:
+    """Counts statements per request against the matched endpoint's budget"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or settings.QUERY_BUDGET_MODE == "off":
+            await self.app(scope, receive, send)
+            return
+        log = QueryLog(scope=scope)
+        token = _current.set(log)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current.reset(token)
+        _check(log)
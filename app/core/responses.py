@@ -0,0 +1,38 @@
+"""Fast JSON responses for list endpoints.
+
+List handlers load plain dicts straight from column rows. By default those
+dicts are encoded with orjson and returned as-is, skipping response_model
+validation and jsonable_encoder. orjson writes str, int, None, date,
+datetime, UUID and Enum values exactly as FastAPI's JSONResponse writes
+the validated schemas (compact separators, UTF-8 rather than \\u escapes),
+so the bytes are the same either way. benchmarks/serialization.py checks
+this.
+"""
+from typing import Any
+
+import orjson
+from fastapi import Response
+from fastapi.responses import JSONResponse
+
+from app.core.config import settings
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        # asyncpg returns its own UUID type, which orjson does not recognise;
+        # str() gives the same canonical form as uuid.UUID
+        return orjson.dumps(content, default=str)
+
+
+def list_response(content: Any, response: Response) -> Any:
+    """Return content from a handler, encoded by orjson when FAST_JSON_RESPONSES is on.
+
+    `response` is the one FastAPI injects into the handler and its
+    dependencies. A returned Response replaces it, so headers set there
+    (the ETag from conditional_get) are copied over.
+    """
+    if not settings.FAST_JSON_RESPONSES:
+        return content
+    fast = FastJSONResponse(content)
+    fast.headers.update(response.headers)
+    return fast
@@ -1,20 +1,78 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from functools import lru_cache
+from typing import Optional, Tuple
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
 from app.core.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+@lru_cache
+def _pwd_context() -> CryptContext:
+    # Pinning min/max to the configured cost makes verify_and_update hand back a
+    # fresh hash whenever BCRYPT_ROUNDS changes, in either direction
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+        bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+        bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+    )
+
+
+@lru_cache
+def _hash_executor() -> ThreadPoolExecutor:
+    # bcrypt releases the GIL, so a small dedicated thread pool gives real
+    # parallelism without competing with the default threadpool
+    return ThreadPoolExecutor(
+        max_workers=settings.PASSWORD_HASH_WORKERS,
+        thread_name_prefix="password-hash",
+    )
+
+
+_pending_hashes = 0
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when PASSWORD_HASH_MAX_PENDING hash/verify calls are already in flight"""
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return _pwd_context().verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return _pwd_context().hash(password)
+
+
+async def _run_hasher(func, *args):
+    # Only touched from the event loop thread, so the counter needs no lock
+    global _pending_hashes
+    if _pending_hashes >= settings.PASSWORD_HASH_MAX_PENDING:
+        raise PasswordHasherBusy()
+    _pending_hashes += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor(), func, *args)
+    finally:
+        _pending_hashes -= 1
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_hasher(_pwd_context().hash, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify off the event loop; also returns a new hash if the stored one uses an outdated cost"""
+    return await _run_hasher(_pwd_context().verify_and_update, plain_password, hashed_password)
+
+
+def shutdown_password_hasher() -> None:
+    if _hash_executor.cache_info().currsize:
+        _hash_executor().shutdown(wait=False, cancel_futures=True)
+        _hash_executor.cache_clear()
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
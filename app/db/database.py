@@ -1,18 +1,171 @@
+import asyncio
+from functools import lru_cache
+from typing import Optional
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+from app.core import query_budget
 from app.core.config import settings
+from app.core.metrics import TimedQueuePool, instrument_engine
+
+
+def _async_database_url(url: str) -> str:
+    """Swap the configured sync driver for asyncpg."""
+    return make_url(url).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
+
+def _pool_options() -> dict:
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def _create_async_engine(url: str, name: str, **options) -> AsyncEngine:
+    connect_args = {}
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        connect_args["server_settings"] = {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}
+    created = create_async_engine(
+        url, poolclass=TimedQueuePool, connect_args=connect_args, **_pool_options(), **options
+    )
+    instrument_engine(created.sync_engine, name)
+    query_budget.install(created.sync_engine)
+    return created
+
+
+# Engines and session factories are built on first use rather than at
+# import, so importing the app (or a model) needs neither settings nor a
+# database. They are still module attributes: `from app.db.database import
+# async_engine` works through __getattr__ below.
+
+
+@lru_cache
+def get_engine() -> Engine:
+    """The sync engine, kept for scripts, maintenance commands and benchmarks"""
+    return create_engine(
+        settings.DATABASE_URL,
+        connect_args={"options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"},
+        **_pool_options(),
+    )
+
+
+@lru_cache
+def get_async_engine() -> AsyncEngine:
+    return _create_async_engine(settings.ASYNC_DATABASE_URL or _async_database_url(settings.DATABASE_URL), "primary")
+
+
+@lru_cache
+def get_read_engine() -> AsyncEngine:
+    # Read-only GET endpoints use the replica when one is configured, otherwise
+    # the primary's pool. Either way transactions are READ ONLY, so a write on
+    # the read path fails in development just as it would against a replica.
+    if settings.READ_REPLICA_URL:
+        return _create_async_engine(
+            _async_database_url(settings.READ_REPLICA_URL), "replica", execution_options={"postgresql_readonly": True}
+        )
+    return get_async_engine().execution_options(postgresql_readonly=True)
+
+
+@lru_cache
+def _session_factory():
+    return sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+
+
+@lru_cache
+def _async_session_factory(readonly: bool = False):
+    return async_sessionmaker(
+        bind=get_read_engine() if readonly else get_async_engine(),
+        class_=AsyncSession,
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
+
+_LAZY_ATTRIBUTES = {
+    "engine": get_engine,
+    "SessionLocal": _session_factory,
+    "async_engine": get_async_engine,
+    "AsyncSessionLocal": _async_session_factory,
+    "read_engine": get_read_engine,
+    "ReadSessionLocal": lambda: _async_session_factory(readonly=True),
+}
+
+
+def __getattr__(name: str):
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-engine = create_engine(settings.DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
 
 def get_db():
-    db = SessionLocal()
+    db = _session_factory()()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with _async_session_factory()() as db:
+        yield db
+
+
+async def get_read_db():
+    """Session for read-only endpoints, on the replica if READ_REPLICA_URL is set"""
+    async with _async_session_factory(readonly=True)() as db:
+        yield db
+
+
+async def create_schema() -> None:
+    """create_all on the primary; for throwaway databases, see DB_CREATE_SCHEMA"""
+    import app.models  # noqa: F401  registers every table on Base.metadata
+
+    async with get_async_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def warm_up_pools(connections: int) -> None:
+    """Open connections on each engine so the first requests do not pay for them"""
+    # Connections beyond pool_size would be closed again as soon as they are returned
+    connections = min(connections, settings.DB_POOL_SIZE)
+    engines = [get_async_engine()]
+    if settings.READ_REPLICA_URL:
+        engines.append(get_read_engine())
+    for warmed in engines:
+        opened = await asyncio.gather(*(warmed.connect() for _ in range(connections)))
+        for conn in opened:
+            await conn.close()
+
+
+async def dispose_engines() -> None:
+    """Close pooled connections of the engines created so far"""
+    if settings.READ_REPLICA_URL and get_read_engine.cache_info().currsize:
+        await get_read_engine().dispose()
+    if get_async_engine.cache_info().currsize:
+        await get_async_engine().dispose()
+    if get_engine.cache_info().currsize:
+        get_engine().dispose()
+
+
+def unique_violation(exc: IntegrityError) -> Optional[str]:
+    """The unique index or constraint an INSERT or UPDATE violated, else None.
+
+    Read from asyncpg's error fields rather than the message, which Postgres
+    translates according to lc_messages.
+    """
+    # SQLAlchemy's asyncpg adapter raises its own error from asyncpg's
+    cause = exc.orig.__cause__
+    if getattr(cause, "sqlstate", None) == "23505":
+        return cause.constraint_name
+    return None
@@ -0,0 +1,30 @@
+from fastapi import Depends, HTTPException, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.database import get_read_db
+from app.models.user import User
+from app.routers.auth import get_current_user
+from app.services.versioning import etag_matches, get_data_version, make_etag
+
+
+async def conditional_get(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+) -> None:
+    """ETag/If-None-Match support for per-user GET endpoints.
+
+    Runs before the endpoint body, so a matching request is answered with
+    304 after one primary-key lookup instead of the endpoint's queries. The
+    version is read through the endpoint's own read session, so on a replica
+    the ETag always describes the snapshot the body is built from. The
+    version is also left on request.state for version-keyed caches.
+    """
+    version = await get_data_version(db, current_user.id)
+    request.state.data_version = version
+    etag = make_etag(current_user.id, version, request)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(etag, if_none_match):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
@@ -1,20 +1,46 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST
+
+from app.core.admission import close_rate_limiter, rate_limiter
+from app.core.compression import CompressionMiddleware
+from app.core.config import settings
+from app.core.metrics import MetricsMiddleware, render_metrics
+from app.core.query_budget import QueryBudgetMiddleware, query_budget
+from app.core.security import shutdown_password_hasher
+from app.db.database import create_schema, dispose_engines, warm_up_pools
+from app.routers import auth, workouts, exercises, exercise_names, stats, sync
+
 
-from app.db.database import engine, Base
-from app.routers import auth, workouts, exercises, stats
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Importing this module reads no settings and opens no connections; the
+    # schema is managed by Alembic (`alembic upgrade head` before starting)
+    if settings.DB_CREATE_SCHEMA:
+        await create_schema()
+    if settings.DB_POOL_WARMUP:
+        await warm_up_pools(settings.DB_POOL_WARMUP)
+    # Fails here rather than on the first request if the backend is misconfigured
+    rate_limiter()
+    yield
+    shutdown_password_hasher()
+    await close_rate_limiter()
+    await dispose_engines()
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
 
 app = FastAPI(
     title="Fitness Tracker API",
     description="Backend API for the Fitness Tracker mobile app",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
+# Innermost, so the other middleware see the headers of the encoded response
+app.add_middleware(CompressionMiddleware)
 # CORS configuration
 app.add_middleware(
     CORSMiddleware,
@@ -23,15 +49,22 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Passes requests straight through unless QUERY_BUDGET_MODE is set
+app.add_middleware(QueryBudgetMiddleware)
+# Added last so it is outermost and also times CORS handling
+app.add_middleware(MetricsMiddleware)
 
 # Include routers
 app.include_router(auth.router, prefix="/api")
 app.include_router(workouts.router, prefix="/api")
 app.include_router(exercises.router, prefix="/api")
+app.include_router(exercise_names.router, prefix="/api")
 app.include_router(stats.router, prefix="/api")
+app.include_router(sync.router, prefix="/api")
 
 
 @app.get("/")
+@query_budget(0)
 def root():
     return {
         "name": "Fitness Tracker API",
@@ -41,5 +74,13 @@ def root():
 
 
 @app.get("/health")
+@query_budget(0)
 def health_check():
     return {"status": "healthy"}
+
+
+@app.get("/metrics", include_in_schema=False)
+@query_budget(0)
+def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
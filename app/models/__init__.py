@@ -1,3 +1,5 @@
-from app.models.user import User
+from app.models.user import User, UserDataVersion
 from app.models.workout import Workout
 from app.models.exercise import Exercise
+from app.models.stats import DailyStats, PersonalRecord, UserStreak
+from app.models.sync import SyncTombstone
@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Enum
+from sqlalchemy import BigInteger, Column, Computed, String, Integer, DateTime, ForeignKey, Enum
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 import enum
@@ -23,13 +23,18 @@ class Exercise(Base):
     __tablename__ = "exercises"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    workout_id = Column(UUID(as_uuid=True), ForeignKey("workouts.id"), nullable=False)
+    workout_id = Column(UUID(as_uuid=True), ForeignKey("workouts.id"), nullable=False, index=True)
     name = Column(String, nullable=False)
     muscle_group = Column(Enum(MuscleGroup), nullable=False)
     sets = Column(Integer, nullable=False)
     reps = Column(Integer, nullable=False)
     weight = Column(Integer, nullable=True)  # in kg or lbs
     notes = Column(String, nullable=True)
+    # Stored generated columns, summed by the rollup and personal records;
+    # exercises without a weight count 0 towards tonnage
+    volume = Column(Integer, Computed("sets * reps", persisted=True))
+    tonnage = Column(Integer, Computed("sets * reps * coalesce(weight, 0)", persisted=True))
     created_at = Column(DateTime, default=datetime.utcnow)
+    sync_seq = Column(BigInteger, nullable=False, default=0)  # data version of the last write
 
     workout = relationship("Workout", back_populates="exercises")
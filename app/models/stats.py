@@ -0,0 +1,59 @@
+from sqlalchemy import Column, Integer, Date, ForeignKey, Enum, String
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.db.database import Base
+from app.models.exercise import MuscleGroup
+
+
+class DailyStats(Base):
+    """Per-user, per-day, per-muscle-group exercise totals.
+
+    Maintained in the same transaction as workout/exercise writes so the
+    stats endpoints never have to re-aggregate the raw exercise rows.
+    """
+    __tablename__ = "daily_stats"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    date = Column(Date, primary_key=True)
+    muscle_group = Column(Enum(MuscleGroup), primary_key=True)
+    exercise_count = Column(Integer, nullable=False, default=0)
+    volume = Column(Integer, nullable=False, default=0)  # sets * reps
+    tonnage = Column(Integer, nullable=False, default=0)  # sets * reps * weight
+
+
+class UserStreak(Base):
+    """Persisted streak state so /stats/streak does not walk the whole history.
+
+    Only the most recent run of consecutive workout days is tracked; the
+    current streak is derived from it and today's date at read time.
+    """
+    __tablename__ = "user_streaks"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    run_start = Column(Date, nullable=True)
+    run_end = Column(Date, nullable=True)
+    longest_streak = Column(Integer, nullable=False, default=0)
+
+
+class PersonalRecord(Base):
+    """Best weight, reps and volume per user and exercise.
+
+    Exercises are grouped by exercise_key, their name lower-cased with runs
+    of whitespace collapsed, so "Bench press" and "bench  Press" share one
+    record. Each best carries the earliest date it was reached, and
+    use_count and last_performed rank names for autocomplete. Maintained in
+    the same transaction as exercise writes, like daily_stats.
+    """
+    __tablename__ = "personal_records"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    exercise_key = Column(String, primary_key=True)
+    name = Column(String, nullable=False)  # spelling used most recently
+    max_weight = Column(Integer, nullable=True)  # null until done with a weight
+    max_weight_date = Column(Date, nullable=True)
+    max_reps = Column(Integer, nullable=False)
+    max_reps_date = Column(Date, nullable=False)
+    max_volume = Column(Integer, nullable=False)  # sets * reps
+    max_volume_date = Column(Date, nullable=False)
+    last_performed = Column(Date, nullable=False)
+    use_count = Column(Integer, nullable=False, default=0)  # exercises with this name
@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, String
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.db.database import Base
+
+
+class SyncTombstone(Base):
+    """A deleted workout or exercise, kept so /sync can report the deletion.
+
+    seq is the data version of the deleting transaction, the same number
+    written to sync_seq on the rows a transaction creates or updates.
+    """
+    __tablename__ = "sync_tombstones"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    seq = Column(BigInteger, primary_key=True)
+    entity_id = Column(UUID(as_uuid=True), primary_key=True)
+    entity = Column(String, nullable=False)  # "workout" or "exercise"
+    deleted_at = Column(DateTime, nullable=False, default=datetime.utcnow)
@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime, date
 
-from sqlalchemy import Column, String, DateTime, Date, ForeignKey
+from sqlalchemy import BigInteger, Column, String, DateTime, Date, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
@@ -10,13 +10,21 @@ from app.db.database import Base
 
 class Workout(Base):
     __tablename__ = "workouts"
+    __table_args__ = (
+        # One workout per user per day; serves every per-user date lookup
+        Index("ix_workouts_user_id_date", "user_id", "date", unique=True),
+        # Workouts changed since a sync token
+        Index("ix_workouts_user_id_sync_seq", "user_id", "sync_seq"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
-    date = Column(Date, nullable=False, index=True)
+    date = Column(Date, nullable=False)
     notes = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Data version of the last write to the workout or any of its exercises
+    sync_seq = Column(BigInteger, nullable=False, default=0)
 
     user = relationship("User", back_populates="workouts")
     exercises = relationship("Exercise", back_populates="workout", cascade="all, delete-orphan")
@@ -1,13 +1,27 @@
+import time
 from datetime import timedelta
-from typing import Annotated
+from typing import Annotated, List, Optional, Tuple
+from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import event, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.admission import AdmissionRejected, check_rate, concurrency_slot
+from app.core.cache import TTLCache
 from app.core.config import settings
-from app.core.security import verify_password, get_password_hash, create_access_token, decode_access_token
-from app.db.database import get_db
+from app.core.metrics import register_cache
+from app.core.query_budget import query_budget
+from app.core.security import (
+    PasswordHasherBusy,
+    create_access_token,
+    decode_access_token,
+    hash_password_async,
+    verify_password_async,
+)
+from app.db.database import get_async_db, unique_violation
 from app.models.user import User
 from app.schemas.user import UserCreate, UserResponse, Token
 
@@ -15,65 +29,198 @@ router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
+# Access token -> user id, and user id -> detached User, so most authenticated
+# requests skip both the JWT decode and the users lookup
+token_cache = TTLCache(maxsize=lambda: settings.USER_CACHE_SIZE, ttl=lambda: settings.USER_CACHE_TTL_SECONDS)
+user_cache = TTLCache(maxsize=lambda: settings.USER_CACHE_SIZE, ttl=lambda: settings.USER_CACHE_TTL_SECONDS)
+register_cache("token", token_cache)
+register_cache("user", user_cache)
 
-def get_current_user(
+
+# Unique indexes on users mapped to the registration error they mean
+UNIQUE_VIOLATIONS = {
+    "ix_users_email": "Email already registered",
+    "ix_users_username": "Username already taken",
+}
+
+# Longest submitted email used in an auth rate limit key; emails are at most 254
+MAX_ACCOUNT_KEY_LENGTH = 254
+
+
+def _hasher_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication is busy, please retry",
+        headers={"Retry-After": "1"},
+    )
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target: User) -> None:
+    user_cache.pop(target.id)
+
+
+def token_user_id(token: str) -> Optional[UUID]:
+    """User id of a valid access token, or None; decoded tokens are cached"""
+    user_id = token_cache.get(token)
+    if user_id is None:
+        payload = decode_access_token(token)
+        if payload is None or payload.get("sub") is None:
+            return None
+        try:
+            user_id = UUID(payload["sub"])
+        except ValueError:
+            return None
+        # Never keep a token cached past its own expiry
+        token_cache.set(token, user_id, ttl=payload.get("exp", 0) - time.time())
+    return user_id
+
+
+async def _submitted_account(request: Request) -> str:
+    """The email a login form or registration body names, lower-cased; "" if none.
+
+    FastAPI has already read the body for the endpoint, so this reparses
+    nothing; a malformed body is left for the endpoint to reject.
+    """
+    try:
+        if request.headers.get("content-type", "").startswith("application/json"):
+            body = await request.json()
+            account = body.get("email") if isinstance(body, dict) else None
+        else:
+            account = (await request.form()).get("username")
+    except Exception:
+        account = None
+    return account.strip().lower()[:MAX_ACCOUNT_KEY_LENGTH] if isinstance(account, str) else ""
+
+
+async def _rate_keys(request: Request, route_class: str) -> List[Tuple[str, str]]:
+    """The (bucket, client) pairs a request takes a token from (see check_rate).
+
+    Requests are keyed by the user of a valid bearer token, else the client
+    address. Auth requests are keyed by the address and the email they name,
+    so clients sharing an address (behind NAT, or a proxy whose headers
+    uvicorn does not trust) do not share one bucket of login attempts. They
+    also pass the auth_address bucket of the address alone, which limits
+    trying many emails from one address.
+    """
+    address = f"ip:{request.client.host if request.client else 'unknown'}"
+    if route_class == "auth":
+        return [
+            ("auth_address", address),
+            ("auth", f"{address}:account:{await _submitted_account(request)}"),
+        ]
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        user_id = token_user_id(token)
+        if user_id is not None:
+            return [(route_class, f"user:{user_id}")]
+    return [(route_class, address)]
+
+
+def admission(route_class: str):
+    """Dependency admitting a request of route_class (see app.core.admission).
+
+    List it in the route's or router's dependencies so it runs before the
+    endpoint's own: a rejected request is not authenticated and never checks
+    out a connection. The concurrency slot is held until the endpoint returns.
+    """
+    async def admit(request: Request):
+        try:
+            for bucket, client in await _rate_keys(request, route_class):
+                await check_rate(bucket, client)
+            with concurrency_slot(route_class):
+                yield
+        except AdmissionRejected as exc:
+            raise HTTPException(
+                status_code=exc.status_code, detail=exc.detail, headers={"Retry-After": str(exc.retry_after)}
+            )
+
+    return admit
+
+
+async def get_current_user(
     token: Annotated[str, Depends(oauth2_scheme)],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    payload = decode_access_token(token)
-    if payload is None:
-        raise credentials_exception
-    user_id = payload.get("sub")
+    user_id = token_user_id(token)
     if user_id is None:
         raise credentials_exception
-    user = db.query(User).filter(User.id == user_id).first()
+
+    user = user_cache.get(user_id)
     if user is None:
-        raise credentials_exception
+        user = await db.get(User, user_id)
+        if user is None:
+            raise credentials_exception
+        # Detach so the instance can be shared across requests and sessions
+        db.expunge(user)
+        # End the transaction so the connection goes back to the pool; GET
+        # endpoints run on a read session and would otherwise hold a primary
+        # connection until the response is sent
+        await db.commit()
+        user_cache.set(user_id, user)
     return user
 
 
-@router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def register(user_data: UserCreate, db: Session = Depends(get_db)):
-    # Check if email exists
-    if db.query(User).filter(User.email == user_data.email).first():
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered"
-        )
-    # Check if username exists
-    if db.query(User).filter(User.username == user_data.username).first():
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Username already taken"
-        )
+@router.post(
+    "/register",
+    response_model=UserResponse,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(admission("auth"))],
+)
+@query_budget(1)
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    try:
+        hashed_password = await hash_password_async(user_data.password)
+    except PasswordHasherBusy:
+        raise _hasher_busy()
 
     user = User(
         email=user_data.email,
         username=user_data.username,
-        hashed_password=get_password_hash(user_data.password),
+        hashed_password=hashed_password,
         full_name=user_data.full_name
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    # A single INSERT; duplicates are reported by the unique indexes
+    try:
+        await db.commit()
+    except IntegrityError as exc:
+        await db.rollback()
+        detail = UNIQUE_VIOLATIONS.get(unique_violation(exc))
+        if detail is None:
+            raise
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
     return user
 
 
-@router.post("/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+@router.post("/login", response_model=Token, dependencies=[Depends(admission("auth"))])
+@query_budget(2)
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await db.scalar(select(User).where(User.email == form_data.username))
+    verified, new_hash = False, None
+    if user:
+        try:
+            verified, new_hash = await verify_password_async(form_data.password, user.hashed_password)
+        except PasswordHasherBusy:
+            raise _hasher_busy()
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    if new_hash:
+        # BCRYPT_ROUNDS changed since this password was hashed
+        user.hashed_password = new_hash
+        await db.commit()
+
     access_token = create_access_token(
         data={"sub": str(user.id)},
         expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -82,5 +229,6 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
 
 
 @router.get("/me", response_model=UserResponse)
-def get_me(current_user: User = Depends(get_current_user)):
+@query_budget(1)
+async def get_me(current_user: User = Depends(get_current_user)):
     return current_user
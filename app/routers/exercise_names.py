@@ -0,0 +1,28 @@
+from typing import Dict, List
+
+from fastapi import APIRouter, Depends, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.query_budget import query_budget
+from app.core.responses import list_response
+from app.db.database import get_read_db
+from app.dependencies import conditional_get
+from app.models.user import User
+from app.services.records import autocomplete
+from app.routers.auth import get_current_user
+
+router = APIRouter(prefix="/exercises", tags=["Exercises"])
+
+
+@router.get("/autocomplete", dependencies=[Depends(conditional_get)])
+@query_budget(3)
+async def autocomplete_exercise_names(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=100, description="Start of any word in the name"),
+    limit: int = Query(10, ge=1, le=50, description="Maximum names to return"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+) -> List[Dict]:
+    """Suggest exercise names the user has logged, most used first"""
+    results = await db.execute(autocomplete(current_user.id, q, limit))
+    return list_response([dict(r._mapping) for r in results], response)
@@ -1,47 +1,83 @@
+import uuid
 from typing import List
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.database import get_db
+from app.core.query_budget import query_budget
+from app.core.responses import list_response
+from app.db.database import get_async_db, get_read_db
+from app.dependencies import conditional_get
 from app.models.user import User
 from app.models.workout import Workout
 from app.models.exercise import Exercise
-from app.schemas.exercise import ExerciseCreate, ExerciseResponse, ExerciseUpdate
-from app.routers.auth import get_current_user
+from app.services.records import RecordsDelta
+from app.services.rollup import RollupDelta
+from app.services.serialization import EXERCISE_COLUMNS
+from app.services.sync import record_deletions
+from app.services.versioning import bump_data_version
+from app.schemas.exercise import ExerciseBatch, ExerciseCreate, ExerciseResponse, ExerciseUpdate
+from app.routers.auth import admission, get_current_user
 
 router = APIRouter(prefix="/workouts/{workout_id}/exercises", tags=["Exercises"])
+# Rate limits and concurrency cap shared by every endpoint that writes
+admit_writes = Depends(admission("writes"))
 
 
-def get_workout_or_404(workout_id: UUID, user_id: UUID, db: Session) -> Workout:
-    workout = db.query(Workout).filter(
-        Workout.id == workout_id,
-        Workout.user_id == user_id
-    ).first()
+async def get_workout_or_404(workout_id: UUID, user_id: UUID, db: AsyncSession) -> Workout:
+    workout = await db.scalar(
+        select(Workout).where(
+            Workout.id == workout_id,
+            Workout.user_id == user_id
+        )
+    )
     if not workout:
         raise HTTPException(status_code=404, detail="Workout not found")
     return workout
 
 
-@router.get("", response_model=List[ExerciseResponse])
-def get_exercises(
+async def get_exercise_or_404(exercise_id: UUID, workout_id: UUID, db: AsyncSession) -> Exercise:
+    exercise = await db.scalar(
+        select(Exercise).where(
+            Exercise.id == exercise_id,
+            Exercise.workout_id == workout_id
+        )
+    )
+    if not exercise:
+        raise HTTPException(status_code=404, detail="Exercise not found")
+    return exercise
+
+
+@router.get("", response_model=List[ExerciseResponse], dependencies=[Depends(conditional_get)])
+@query_budget(4)
+async def get_exercises(
     workout_id: UUID,
-    db: Session = Depends(get_db),
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
-    workout = get_workout_or_404(workout_id, current_user.id, db)
-    return workout.exercises
+    workout = await get_workout_or_404(workout_id, current_user.id, db)
+    rows = await db.execute(select(*EXERCISE_COLUMNS).where(Exercise.workout_id == workout.id))
+    return list_response([row._asdict() for row in rows], response)
 
 
-@router.post("", response_model=ExerciseResponse, status_code=status.HTTP_201_CREATED)
-def create_exercise(
+@router.post(
+    "",
+    response_model=ExerciseResponse,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[admit_writes],
+)
+@query_budget(7)
+async def create_exercise(
     workout_id: UUID,
     exercise_data: ExerciseCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    workout = get_workout_or_404(workout_id, current_user.id, db)
+    workout = await get_workout_or_404(workout_id, current_user.id, db)
+    workout.sync_seq = version = await bump_data_version(db, current_user.id)
 
     exercise = Exercise(
         workout_id=workout.id,
@@ -50,51 +86,142 @@ def create_exercise(
         sets=exercise_data.sets,
         reps=exercise_data.reps,
         weight=exercise_data.weight,
-        notes=exercise_data.notes
+        notes=exercise_data.notes,
+        sync_seq=version
     )
     db.add(exercise)
-    db.commit()
-    db.refresh(exercise)
+
+    rollup = RollupDelta()
+    rollup.add(workout.date, exercise)
+    await rollup.apply(db, current_user.id)
+    records = RecordsDelta()
+    records.add(workout.date, exercise)
+    await records.apply(db, current_user.id)
+
+    await db.commit()
     return exercise
 
 
-@router.get("/{exercise_id}", response_model=ExerciseResponse)
-def get_exercise(
+@router.post("/batch", response_model=List[ExerciseResponse], dependencies=[admit_writes])
+@query_budget(15)
+async def batch_exercises(
     workout_id: UUID,
-    exercise_id: UUID,
-    db: Session = Depends(get_db),
+    batch: ExerciseBatch,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    workout = get_workout_or_404(workout_id, current_user.id, db)
+    """Apply creates, updates and deletes in one transaction.
 
-    exercise = db.query(Exercise).filter(
-        Exercise.id == exercise_id,
-        Exercise.workout_id == workout.id
-    ).first()
+    Each kind of change is a single bulk statement, so saving a whole
+    workout screen costs the same number of round trips however many
+    exercises it touches. Returns the workout's resulting exercise list.
+    """
+    workout = await get_workout_or_404(workout_id, current_user.id, db)
 
-    if not exercise:
-        raise HTTPException(status_code=404, detail="Exercise not found")
+    update_ids = [change.id for change in batch.update]
+    touched_ids = set(update_ids) | set(batch.delete)
+    if len(touched_ids) != len(update_ids) + len(batch.delete):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Each exercise may appear only once: in one update or in delete"
+        )
 
-    return exercise
+    current = {}
+    if touched_ids:
+        current = {
+            row.id: row
+            for row in await db.execute(
+                select(
+                    Exercise.id, Exercise.name, Exercise.muscle_group, Exercise.sets,
+                    Exercise.reps, Exercise.weight, Exercise.notes
+                ).where(
+                    Exercise.id.in_(touched_ids),
+                    Exercise.workout_id == workout.id
+                )
+            )
+        }
+        if len(current) != len(touched_ids):
+            raise HTTPException(status_code=404, detail="Exercise not found")
+
+    workout.sync_seq = version = await bump_data_version(db, current_user.id)
+    rollup = RollupDelta()
+    records = RecordsDelta()
+
+    if batch.delete:
+        for exercise_id in batch.delete:
+            rollup.remove(workout.date, current[exercise_id])
+            records.remove(workout.date, current[exercise_id])
+        await db.execute(
+            delete(Exercise).where(Exercise.id.in_(batch.delete)),
+            execution_options={"synchronize_session": False}
+        )
+        await record_deletions(db, current_user.id, version, exercise_ids=batch.delete)
+
+    if batch.update:
+        rows = []
+        for change in batch.update:
+            old = current[change.id]
+            new = ExerciseCreate(**{
+                **old._asdict(),
+                **change.model_dump(exclude={"id"}, exclude_none=True)
+            })
+            rollup.remove(workout.date, old)
+            rollup.add(workout.date, new)
+            records.remove(workout.date, old)
+            records.add(workout.date, new)
+            rows.append({"id": change.id, **new.model_dump(), "sync_seq": version})
+        # Bulk UPDATE by primary key, sent as one executemany
+        await db.execute(update(Exercise), rows)
+
+    if batch.create:
+        rows = []
+        for exercise_data in batch.create:
+            rows.append({
+                "id": uuid.uuid4(), "workout_id": workout.id, **exercise_data.model_dump(), "sync_seq": version
+            })
+            rollup.add(workout.date, exercise_data)
+            records.add(workout.date, exercise_data)
+        await db.execute(insert(Exercise.__table__), rows)
 
+    await rollup.apply(db, current_user.id)
+    await records.apply(db, current_user.id)
+    await db.commit()
 
-@router.put("/{exercise_id}", response_model=ExerciseResponse)
-def update_exercise(
+    exercises = await db.scalars(
+        select(Exercise).where(Exercise.workout_id == workout.id).execution_options(populate_existing=True)
+    )
+    return exercises.all()
+
+
+@router.get("/{exercise_id}", response_model=ExerciseResponse, dependencies=[Depends(conditional_get)])
+@query_budget(4)
+async def get_exercise(
     workout_id: UUID,
     exercise_id: UUID,
-    exercise_data: ExerciseUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
-    workout = get_workout_or_404(workout_id, current_user.id, db)
+    workout = await get_workout_or_404(workout_id, current_user.id, db)
+    return await get_exercise_or_404(exercise_id, workout.id, db)
 
-    exercise = db.query(Exercise).filter(
-        Exercise.id == exercise_id,
-        Exercise.workout_id == workout.id
-    ).first()
 
-    if not exercise:
-        raise HTTPException(status_code=404, detail="Exercise not found")
+@router.put("/{exercise_id}", response_model=ExerciseResponse, dependencies=[admit_writes])
+@query_budget(11)
+async def update_exercise(
+    workout_id: UUID,
+    exercise_id: UUID,
+    exercise_data: ExerciseUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    workout = await get_workout_or_404(workout_id, current_user.id, db)
+    exercise = await get_exercise_or_404(exercise_id, workout.id, db)
+    exercise.sync_seq = workout.sync_seq = await bump_data_version(db, current_user.id)
+
+    rollup = RollupDelta()
+    rollup.remove(workout.date, exercise)
+    records = RecordsDelta()
+    records.remove(workout.date, exercise)
 
     if exercise_data.name is not None:
         exercise.name = exercise_data.name
@@ -109,27 +236,35 @@ def update_exercise(
     if exercise_data.notes is not None:
         exercise.notes = exercise_data.notes
 
-    db.commit()
-    db.refresh(exercise)
+    rollup.add(workout.date, exercise)
+    await rollup.apply(db, current_user.id)
+    records.add(workout.date, exercise)
+    await records.apply(db, current_user.id)
+
+    await db.commit()
     return exercise
 
 
-@router.delete("/{exercise_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_exercise(
+@router.delete("/{exercise_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[admit_writes])
+@query_budget(11)
+async def delete_exercise(
     workout_id: UUID,
     exercise_id: UUID,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    workout = get_workout_or_404(workout_id, current_user.id, db)
-
-    exercise = db.query(Exercise).filter(
-        Exercise.id == exercise_id,
-        Exercise.workout_id == workout.id
-    ).first()
+    workout = await get_workout_or_404(workout_id, current_user.id, db)
+    exercise = await get_exercise_or_404(exercise_id, workout.id, db)
+    workout.sync_seq = version = await bump_data_version(db, current_user.id)
 
-    if not exercise:
-        raise HTTPException(status_code=404, detail="Exercise not found")
+    rollup = RollupDelta()
+    rollup.remove(workout.date, exercise)
+    await rollup.apply(db, current_user.id)
+    records = RecordsDelta()
+    records.remove(workout.date, exercise)
+    await record_deletions(db, current_user.id, version, exercise_ids=[exercise.id])
 
-    db.delete(exercise)
-    db.commit()
+    await db.delete(exercise)
+    # After the delete, so a rebuilt record no longer counts this exercise
+    await records.apply(db, current_user.id)
+    await db.commit()
@@ -1,46 +1,64 @@
 from datetime import date, timedelta
 from typing import Dict, List, Optional
 
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-
-from app.db.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.query_budget import query_budget
+from app.core.responses import list_response
+from app.db.database import get_read_db
+from app.dependencies import conditional_get
 from app.models.user import User
 from app.models.workout import Workout
-from app.models.exercise import Exercise, MuscleGroup
-from app.routers.auth import get_current_user
+from app.models.stats import DailyStats, PersonalRecord
+from app.routers.auth import admission, get_current_user
+from app.services.streak import compute_streak, current_streak, get_streak_state
+from app.services.timeseries import MAX_BUCKETS, Bucket, bucket_count, get_timeseries
 
-router = APIRouter(prefix="/stats", tags=["Statistics"])
+router = APIRouter(
+    prefix="/stats",
+    tags=["Statistics"],
+    dependencies=[Depends(admission("stats")), Depends(conditional_get)],
+)
 
 
 @router.get("/summary")
-def get_summary(
-    db: Session = Depends(get_db),
+@query_budget(4)
+async def get_summary(
+    include_tonnage: bool = Query(False, description="Also return tonnage, sets x reps x weight"),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ) -> Dict:
     """Get all-time stats summary"""
-    total_workouts = db.query(Workout).filter(Workout.user_id == current_user.id).count()
-
-    total_exercises = db.query(Exercise).join(Workout).filter(
-        Workout.user_id == current_user.id
-    ).count()
-
-    total_volume = db.query(func.sum(Exercise.sets * Exercise.reps)).join(Workout).filter(
-        Workout.user_id == current_user.id
-    ).scalar() or 0
-
-    return {
+    total_workouts = await db.scalar(
+        select(func.count(Workout.id)).where(Workout.user_id == current_user.id)
+    )
+
+    totals = (await db.execute(
+        select(
+            func.coalesce(func.sum(DailyStats.exercise_count), 0).label("exercise_count"),
+            func.coalesce(func.sum(DailyStats.volume), 0).label("volume"),
+            func.coalesce(func.sum(DailyStats.tonnage), 0).label("tonnage")
+        ).where(DailyStats.user_id == current_user.id)
+    )).one()
+
+    summary = {
         "total_workouts": total_workouts,
-        "total_exercises": total_exercises,
-        "total_volume": total_volume
+        "total_exercises": totals.exercise_count,
+        "total_volume": totals.volume
     }
+    if include_tonnage:
+        summary["total_tonnage"] = totals.tonnage
+    return summary
 
 
 @router.get("/weekly")
-def get_weekly_stats(
+@query_budget(4)
+async def get_weekly_stats(
     start_date: Optional[date] = Query(None, description="Start of week"),
-    db: Session = Depends(get_db),
+    include_tonnage: bool = Query(False, description="Also return tonnage, sets x reps x weight"),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ) -> Dict:
     """Get stats for a specific week"""
@@ -51,96 +69,145 @@ def get_weekly_stats(
 
     end_date = start_date + timedelta(days=6)
 
-    workouts = db.query(Workout).filter(
-        Workout.user_id == current_user.id,
-        Workout.date >= start_date,
-        Workout.date <= end_date
-    ).all()
-
-    workout_count = len(workouts)
-    workout_ids = [w.id for w in workouts]
-
-    exercises = db.query(Exercise).filter(Exercise.workout_id.in_(workout_ids)).all() if workout_ids else []
-
-    muscle_groups = set(e.muscle_group.value for e in exercises)
-    total_volume = sum(e.sets * e.reps for e in exercises)
-
-    return {
+    workout_count = await db.scalar(
+        select(func.count(Workout.id)).where(
+            Workout.user_id == current_user.id,
+            Workout.date >= start_date,
+            Workout.date <= end_date
+        )
+    )
+
+    totals = (await db.execute(
+        select(
+            func.coalesce(func.sum(DailyStats.exercise_count), 0).label("exercise_count"),
+            func.count(func.distinct(DailyStats.muscle_group)).label("muscle_groups"),
+            func.coalesce(func.sum(DailyStats.volume), 0).label("volume"),
+            func.coalesce(func.sum(DailyStats.tonnage), 0).label("tonnage")
+        ).where(
+            DailyStats.user_id == current_user.id,
+            DailyStats.date >= start_date,
+            DailyStats.date <= end_date
+        )
+    )).one()
+
+    weekly = {
         "start_date": start_date.isoformat(),
         "end_date": end_date.isoformat(),
         "workout_count": workout_count,
-        "exercise_count": len(exercises),
-        "muscle_groups_trained": len(muscle_groups),
-        "total_volume": total_volume
+        "exercise_count": totals.exercise_count,
+        "muscle_groups_trained": totals.muscle_groups,
+        "total_volume": totals.volume
     }
+    if include_tonnage:
+        weekly["total_tonnage"] = totals.tonnage
+    return weekly
 
 
 @router.get("/muscle-groups")
-def get_muscle_group_stats(
+@query_budget(3)
+async def get_muscle_group_stats(
+    response: Response,
     days: int = Query(30, description="Number of days to analyze"),
-    db: Session = Depends(get_db),
+    include_tonnage: bool = Query(False, description="Also return tonnage, sets x reps x weight"),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ) -> List[Dict]:
     """Get volume by muscle group for the last N days"""
     start_date = date.today() - timedelta(days=days)
 
-    results = db.query(
-        Exercise.muscle_group,
-        func.sum(Exercise.sets * Exercise.reps).label("volume"),
-        func.count(Exercise.id).label("exercise_count")
-    ).join(Workout).filter(
-        Workout.user_id == current_user.id,
-        Workout.date >= start_date
-    ).group_by(Exercise.muscle_group).all()
-
-    return [
-        {
+    results = (await db.execute(
+        select(
+            DailyStats.muscle_group,
+            func.sum(DailyStats.volume).label("volume"),
+            func.sum(DailyStats.exercise_count).label("exercise_count"),
+            func.sum(DailyStats.tonnage).label("tonnage")
+        ).where(
+            DailyStats.user_id == current_user.id,
+            DailyStats.date >= start_date
+        ).group_by(DailyStats.muscle_group)
+    )).all()
+
+    groups = []
+    for r in results:
+        group = {
             "muscle_group": r.muscle_group.value,
             "volume": r.volume or 0,
             "exercise_count": r.exercise_count
         }
-        for r in results
-    ]
+        if include_tonnage:
+            group["tonnage"] = r.tonnage or 0
+        groups.append(group)
+    return list_response(groups, response)
+
+
+@router.get("/timeseries")
+@query_budget(3)
+async def get_timeseries_stats(
+    request: Request,
+    response: Response,
+    bucket: Bucket = Query("week", description="Bucket size"),
+    start_date: Optional[date] = Query(None, description="First day; rounded down to its bucket (a year before end_date)"),
+    end_date: Optional[date] = Query(None, description="Last day (today)"),
+    by_muscle_group: bool = Query(False, description="Also split each bucket by muscle group"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+) -> Dict:
+    """Get workout count, exercise count and volume per day, week or month"""
+    end_date = end_date or date.today()
+    start_date = start_date or end_date - timedelta(days=365)
+    if start_date > end_date:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start_date is after end_date")
+    if bucket_count(start_date, end_date, bucket) > MAX_BUCKETS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Range covers more than {MAX_BUCKETS} buckets; use a larger bucket or a shorter range"
+        )
+
+    return list_response(await get_timeseries(
+        db, current_user.id, request.state.data_version, bucket, start_date, end_date, by_muscle_group
+    ), response)
+
+
+@router.get("/records")
+@query_budget(3)
+async def get_personal_records(
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+) -> List[Dict]:
+    """Get the best weight, reps and volume for every exercise, by name"""
+    results = await db.execute(
+        select(
+            PersonalRecord.name,
+            PersonalRecord.max_weight,
+            PersonalRecord.max_weight_date,
+            PersonalRecord.max_reps,
+            PersonalRecord.max_reps_date,
+            PersonalRecord.max_volume,
+            PersonalRecord.max_volume_date,
+            PersonalRecord.last_performed,
+        ).where(PersonalRecord.user_id == current_user.id).order_by(PersonalRecord.exercise_key)
+    )
+    return list_response([dict(r._mapping) for r in results], response)
 
 
 @router.get("/streak")
-def get_streak(
-    db: Session = Depends(get_db),
+@query_budget(6)
+async def get_streak(
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ) -> Dict:
     """Get current workout streak"""
-    workouts = db.query(Workout.date).filter(
-        Workout.user_id == current_user.id
-    ).order_by(Workout.date.desc()).all()
-
-    if not workouts:
-        return {"current_streak": 0, "longest_streak": 0}
-
-    workout_dates = set(w.date for w in workouts)
+    state = await get_streak_state(db, current_user.id, persist=False)
     today = date.today()
 
-    # Calculate current streak
-    current_streak = 0
-    check_date = today
-    while check_date in workout_dates or (check_date == today and (today - timedelta(days=1)) in workout_dates):
-        if check_date in workout_dates:
-            current_streak += 1
-        check_date -= timedelta(days=1)
-        if check_date not in workout_dates and check_date != today:
-            break
-
-    # Calculate longest streak
-    sorted_dates = sorted(workout_dates)
-    longest_streak = 1
-    current = 1
-    for i in range(1, len(sorted_dates)):
-        if (sorted_dates[i] - sorted_dates[i-1]).days == 1:
-            current += 1
-            longest_streak = max(longest_streak, current)
-        else:
-            current = 1
+    current = current_streak(state, today)
+    if current is None:
+        # Future-dated workouts hide the run ending today; walk the dates instead
+        workout_dates = await db.scalars(select(Workout.date).where(Workout.user_id == current_user.id))
+        return compute_streak(workout_dates, today)
 
     return {
-        "current_streak": current_streak,
-        "longest_streak": longest_streak if sorted_dates else 0
+        "current_streak": current,
+        "longest_streak": state.longest_streak
     }
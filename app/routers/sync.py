@@ -0,0 +1,35 @@
+from typing import Dict, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.query_budget import query_budget
+from app.core.responses import list_response
+from app.db.database import get_read_db
+from app.models.user import User
+from app.services.sync import get_changes
+from app.routers.auth import get_current_user
+
+router = APIRouter(prefix="/sync", tags=["Sync"])
+
+
+@router.get("")
+@query_budget(5)
+async def sync(
+    response: Response,
+    since: Optional[str] = Query(None, description="token from the previous sync; omit for a full sync"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+) -> Dict:
+    """Get workouts and exercises changed since a sync token, and the ids deleted.
+
+    Apply changed rows, then deletions, and keep the returned token for the
+    next call. A full sync returns every row and no deletions.
+    """
+    if since is not None and not since.isdigit():
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid sync token")
+    try:
+        changes = await get_changes(db, current_user.id, int(since) if since is not None else None)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    return list_response(changes, response)
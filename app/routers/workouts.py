@@ -1,41 +1,109 @@
 from datetime import date, timedelta
-from typing import List, Optional
+from typing import Dict, List, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
-from app.db.database import get_db
+from app.core.config import settings
+from app.core.pagination import encode_cursor, decode_cursor
+from app.core.query_budget import query_budget
+from app.core.responses import list_response
+from app.db.database import get_async_db, get_read_db, unique_violation
+from app.dependencies import conditional_get
 from app.models.user import User
 from app.models.workout import Workout
 from app.models.exercise import Exercise
-from app.schemas.workout import WorkoutCreate, WorkoutResponse, WorkoutUpdate
-from app.routers.auth import get_current_user
+from app.services.bulk_import import WorkoutImporter, import_csv, import_ndjson
+from app.services.export import stream_csv, stream_ndjson
+from app.services.records import RecordsDelta
+from app.services.rollup import RollupDelta
+from app.services.serialization import WORKOUT_COLUMNS, attach_exercises, workout_dict
+from app.services.streak import update_streak
+from app.services.sync import record_deletions
+from app.services.versioning import bump_data_version
+from app.services.workout_calendar import MAX_DAYS, get_calendar
+from app.schemas.workout import WorkoutCreate, WorkoutResponse, WorkoutUpdate, WorkoutPage, ImportResult
+from app.routers.auth import admission, get_current_user
 
 router = APIRouter(prefix="/workouts", tags=["Workouts"])
+# Rate limits and concurrency cap shared by every endpoint that writes
+admit_writes = Depends(admission("writes"))
 
 
-@router.get("", response_model=List[WorkoutResponse])
-def get_workouts(
+async def get_workout_or_404(workout_id: UUID, user_id: UUID, db: AsyncSession) -> Workout:
+    workout = await db.scalar(
+        select(Workout).options(selectinload(Workout.exercises)).where(
+            Workout.id == workout_id,
+            Workout.user_id == user_id
+        )
+    )
+    if not workout:
+        raise HTTPException(status_code=404, detail="Workout not found")
+    return workout
+
+
+async def _raise_if_date_taken(db: AsyncSession, exc: IntegrityError, detail: str) -> None:
+    """Roll back and raise 400 if exc is another workout holding the date.
+
+    The endpoints check for one first, but a concurrent request can insert
+    it between that check and the flush; the unique index then rejects ours.
+    """
+    if unique_violation(exc) == "ix_workouts_user_id_date":
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+
+@router.get("", response_model=WorkoutPage, dependencies=[Depends(conditional_get)])
+@query_budget(4)
+async def get_workouts(
+    response: Response,
     start_date: Optional[date] = Query(None, description="Filter from this date"),
     end_date: Optional[date] = Query(None, description="Filter until this date"),
-    db: Session = Depends(get_db),
+    limit: int = Query(50, ge=1, le=200, description="Maximum workouts per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
-    query = db.query(Workout).filter(Workout.user_id == current_user.id)
+    """List workouts newest first, paginated by keyset on (date, id)"""
+    query = select(*WORKOUT_COLUMNS).where(Workout.user_id == current_user.id)
 
     if start_date:
-        query = query.filter(Workout.date >= start_date)
+        query = query.where(Workout.date >= start_date)
     if end_date:
-        query = query.filter(Workout.date <= end_date)
+        query = query.where(Workout.date <= end_date)
+    if cursor:
+        try:
+            cursor_date, cursor_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+        query = query.where(tuple_(Workout.date, Workout.id) < tuple_(cursor_date, cursor_id))
+
+    # Fetch one extra row to know whether another page follows
+    workouts = [
+        workout_dict(row)
+        for row in await db.execute(query.order_by(Workout.date.desc(), Workout.id.desc()).limit(limit + 1))
+    ]
+
+    next_cursor = None
+    if len(workouts) > limit:
+        workouts = workouts[:limit]
+        next_cursor = encode_cursor(workouts[-1]["date"], workouts[-1]["id"])
 
-    return query.order_by(Workout.date.desc()).all()
+    await attach_exercises(db, workouts)
+    return list_response({"items": workouts, "next_cursor": next_cursor}, response)
 
 
-@router.get("/week", response_model=List[WorkoutResponse])
-def get_week_workouts(
+@router.get("/week", response_model=List[WorkoutResponse], dependencies=[Depends(conditional_get)])
+@query_budget(4)
+async def get_week_workouts(
+    response: Response,
     start_date: Optional[date] = Query(None, description="Start of week (defaults to current week's Monday)"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     if not start_date:
@@ -45,54 +113,124 @@ def get_week_workouts(
 
     end_date = start_date + timedelta(days=6)
 
-    workouts = db.query(Workout).filter(
-        Workout.user_id == current_user.id,
-        Workout.date >= start_date,
-        Workout.date <= end_date
-    ).order_by(Workout.date).all()
+    rows = await db.execute(
+        select(*WORKOUT_COLUMNS).where(
+            Workout.user_id == current_user.id,
+            Workout.date >= start_date,
+            Workout.date <= end_date
+        ).order_by(Workout.date)
+    )
 
-    return workouts
+    workouts = await attach_exercises(db, [workout_dict(row) for row in rows])
+    return list_response(workouts, response)
 
 
-@router.get("/date/{workout_date}", response_model=Optional[WorkoutResponse])
-def get_workout_by_date(
+@router.get(
+    "/date/{workout_date}", response_model=Optional[WorkoutResponse], dependencies=[Depends(conditional_get)]
+)
+@query_budget(4)
+async def get_workout_by_date(
     workout_date: date,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
-    workout = db.query(Workout).filter(
-        Workout.user_id == current_user.id,
-        Workout.date == workout_date
-    ).first()
+    workout = await db.scalar(
+        select(Workout).options(selectinload(Workout.exercises)).where(
+            Workout.user_id == current_user.id,
+            Workout.date == workout_date
+        ).limit(1)
+    )
     return workout
 
 
-@router.get("/{workout_id}", response_model=WorkoutResponse)
-def get_workout(
+@router.get("/calendar", dependencies=[Depends(conditional_get)])
+@query_budget(4)
+async def get_calendar_days(
+    request: Request,
+    response: Response,
+    year: Optional[int] = Query(None, ge=1900, le=9999, description="Calendar year; instead of start/end_date"),
+    start_date: Optional[date] = Query(None, description="First day (a year before end_date)"),
+    end_date: Optional[date] = Query(None, description="Last day (today)"),
+    levels: bool = Query(False, description="Also return a volume level (0-4) per day"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+) -> Dict:
+    """Get the days with a workout as a bitmap, for calendar heatmaps.
+
+    `days` is base64 of one bit per day from start_date: bit i % 8 of byte
+    i // 8 is set if day i has a workout. With levels, `levels` has one digit
+    per day: 0 without a workout, else 1 plus the number of
+    `level_thresholds` (volume quartiles of the range) below the day's volume.
+    """
+    if year is not None:
+        if start_date or end_date:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Pass either year or start_date/end_date"
+            )
+        start_date, end_date = date(year, 1, 1), date(year, 12, 31)
+    end_date = end_date or date.today()
+    start_date = start_date or end_date - timedelta(days=365)
+    if start_date > end_date:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start_date is after end_date")
+    if (end_date - start_date).days >= MAX_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"Range covers more than {MAX_DAYS} days"
+        )
+
+    return list_response(await get_calendar(
+        db, current_user.id, request.state.data_version, start_date, end_date, levels
+    ), response)
+
+
+@router.get("/export")
+@query_budget(2)
+async def export_workouts(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    current_user: User = Depends(get_current_user)
+):
+    """Stream the user's full history, oldest first, as NDJSON or CSV"""
+    if format == "csv":
+        return StreamingResponse(
+            stream_csv(current_user.id),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="workouts.csv"'}
+        )
+    return StreamingResponse(
+        stream_ndjson(current_user.id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="workouts.ndjson"'}
+    )
+
+
+@router.get("/{workout_id}", response_model=WorkoutResponse, dependencies=[Depends(conditional_get)])
+@query_budget(4)
+async def get_workout(
     workout_id: UUID,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
-    workout = db.query(Workout).filter(
-        Workout.id == workout_id,
-        Workout.user_id == current_user.id
-    ).first()
-    if not workout:
-        raise HTTPException(status_code=404, detail="Workout not found")
-    return workout
+    return await get_workout_or_404(workout_id, current_user.id, db)
 
 
-@router.post("", response_model=WorkoutResponse, status_code=status.HTTP_201_CREATED)
-def create_workout(
+@router.post(
+    "",
+    response_model=WorkoutResponse,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[admit_writes],
+)
+@query_budget(10)
+async def create_workout(
     workout_data: WorkoutCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     # Check if workout already exists for this date
-    existing = db.query(Workout).filter(
-        Workout.user_id == current_user.id,
-        Workout.date == workout_data.date
-    ).first()
+    existing = await db.scalar(
+        select(Workout.id).where(
+            Workout.user_id == current_user.id,
+            Workout.date == workout_data.date
+        ).limit(1)
+    )
 
     if existing:
         raise HTTPException(
@@ -100,70 +238,148 @@ def create_workout(
             detail="Workout already exists for this date. Use PUT to update."
         )
 
+    version = await bump_data_version(db, current_user.id)
     workout = Workout(
         user_id=current_user.id,
         date=workout_data.date,
-        notes=workout_data.notes
+        notes=workout_data.notes,
+        sync_seq=version,
+        # Built through the relationship so the collection is loaded for the response
+        exercises=[
+            Exercise(
+                name=exercise_data.name,
+                muscle_group=exercise_data.muscle_group,
+                sets=exercise_data.sets,
+                reps=exercise_data.reps,
+                weight=exercise_data.weight,
+                notes=exercise_data.notes,
+                sync_seq=version
+            )
+            for exercise_data in workout_data.exercises or []
+        ]
     )
     db.add(workout)
-    db.flush()
-
-    # Add exercises if provided
-    for exercise_data in workout_data.exercises:
-        exercise = Exercise(
-            workout_id=workout.id,
-            name=exercise_data.name,
-            muscle_group=exercise_data.muscle_group,
-            sets=exercise_data.sets,
-            reps=exercise_data.reps,
-            weight=exercise_data.weight,
-            notes=exercise_data.notes
-        )
-        db.add(exercise)
+    # Flushed here, not by the rollup's first query, so that a workout created
+    # for the same date since the check above is reported the same way
+    try:
+        await db.flush()
+    except IntegrityError as exc:
+        await _raise_if_date_taken(db, exc, "Workout already exists for this date. Use PUT to update.")
+        raise
+
+    rollup = RollupDelta()
+    records = RecordsDelta()
+    for exercise in workout.exercises:
+        rollup.add(workout.date, exercise)
+        records.add(workout.date, exercise)
+    await rollup.apply(db, current_user.id)
+    await records.apply(db, current_user.id)
+    await update_streak(db, current_user.id, added=workout.date)
 
-    db.commit()
-    db.refresh(workout)
+    await db.commit()
     return workout
 
 
-@router.put("/{workout_id}", response_model=WorkoutResponse)
-def update_workout(
+@router.post("/import", response_model=ImportResult, dependencies=[admit_writes])
+@query_budget(1)
+async def import_workouts(
+    request: Request,
+    format: Optional[str] = Query(
+        None, pattern="^(ndjson|csv)$", description="ndjson or csv; defaults from Content-Type"
+    ),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Bulk import workout history streamed as NDJSON or CSV.
+
+    Rows are validated and written in batches as the body arrives. Dates that
+    already have a workout are skipped, and invalid rows are reported by line
+    number without aborting the import.
+    """
+    if format is None:
+        format = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+
+    importer = WorkoutImporter(
+        db, current_user.id, settings.IMPORT_BATCH_SIZE, merge_consecutive=format == "csv"
+    )
+    if format == "csv":
+        return await import_csv(importer, request.stream())
+    return await import_ndjson(importer, request.stream())
+
+
+@router.put("/{workout_id}", response_model=WorkoutResponse, dependencies=[admit_writes])
+@query_budget(14)
+async def update_workout(
     workout_id: UUID,
     workout_data: WorkoutUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    workout = db.query(Workout).filter(
-        Workout.id == workout_id,
-        Workout.user_id == current_user.id
-    ).first()
+    workout = await get_workout_or_404(workout_id, current_user.id, db)
 
-    if not workout:
-        raise HTTPException(status_code=404, detail="Workout not found")
+    redate = workout_data.date is not None and workout_data.date != workout.date
+    if redate:
+        clash = await db.scalar(
+            select(Workout.id).where(
+                Workout.user_id == current_user.id,
+                Workout.date == workout_data.date
+            ).limit(1)
+        )
+        if clash:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Workout already exists for this date"
+            )
+
+    workout.sync_seq = await bump_data_version(db, current_user.id)
+    if redate:
+        rollup = RollupDelta()
+        records = RecordsDelta()
+        for exercise in workout.exercises:
+            rollup.remove(workout.date, exercise)
+            rollup.add(workout_data.date, exercise)
+            records.remove(workout.date, exercise)
+            records.add(workout_data.date, exercise)
+        await rollup.apply(db, current_user.id)
 
-    if workout_data.date is not None:
+        old_date = workout.date
         workout.date = workout_data.date
+        try:
+            await db.flush()
+        except IntegrityError as exc:
+            await _raise_if_date_taken(db, exc, "Workout already exists for this date")
+            raise
+        await records.apply(db, current_user.id)
+        await update_streak(db, current_user.id, added=workout.date, removed=old_date)
     if workout_data.notes is not None:
         workout.notes = workout_data.notes
 
-    db.commit()
-    db.refresh(workout)
+    await db.commit()
     return workout
 
 
-@router.delete("/{workout_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_workout(
+@router.delete("/{workout_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[admit_writes])
+@query_budget(14)
+async def delete_workout(
     workout_id: UUID,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    workout = db.query(Workout).filter(
-        Workout.id == workout_id,
-        Workout.user_id == current_user.id
-    ).first()
+    workout = await get_workout_or_404(workout_id, current_user.id, db)
+    version = await bump_data_version(db, current_user.id)
 
-    if not workout:
-        raise HTTPException(status_code=404, detail="Workout not found")
+    rollup = RollupDelta()
+    records = RecordsDelta()
+    for exercise in workout.exercises:
+        rollup.remove(workout.date, exercise)
+        records.remove(workout.date, exercise)
+    await rollup.apply(db, current_user.id)
+    await record_deletions(
+        db, current_user.id, version,
+        workout_ids=[workout.id], exercise_ids=[exercise.id for exercise in workout.exercises]
+    )
 
-    db.delete(workout)
-    db.commit()
+    await db.delete(workout)
+    await records.apply(db, current_user.id)
+    await update_streak(db, current_user.id, removed=workout.date)
+    await db.commit()
@@ -1,3 +1,3 @@
 from app.schemas.user import UserCreate, UserResponse, UserLogin, Token
-from app.schemas.workout import WorkoutCreate, WorkoutResponse, WorkoutUpdate
-from app.schemas.exercise import ExerciseCreate, ExerciseResponse, ExerciseUpdate, MuscleGroup
+from app.schemas.workout import WorkoutCreate, WorkoutResponse, WorkoutUpdate, WorkoutPage, ImportResult
+from app.schemas.exercise import ExerciseCreate, ExerciseResponse, ExerciseUpdate, ExerciseBatch, MuscleGroup
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from uuid import UUID
 from enum import Enum
 
@@ -45,3 +45,13 @@ class ExerciseResponse(ExerciseBase):
 
     class Config:
         from_attributes = True
+
+
+class ExerciseBatchUpdate(ExerciseUpdate):
+    id: UUID
+
+
+class ExerciseBatch(BaseModel):
+    create: List[ExerciseCreate] = []
+    update: List[ExerciseBatchUpdate] = []
+    delete: List[UUID] = []
@@ -6,6 +6,9 @@ from pydantic import BaseModel
 
 from app.schemas.exercise import ExerciseResponse, ExerciseCreate
 
+# Fields named `date` shadow the type inside class bodies that assign defaults
+DateType = date
+
 
 class WorkoutBase(BaseModel):
     date: date
@@ -17,7 +20,7 @@ class WorkoutCreate(WorkoutBase):
 
 
 class WorkoutUpdate(BaseModel):
-    date: Optional[date] = None
+    date: Optional[DateType] = None
     notes: Optional[str] = None
 
 
@@ -29,3 +32,25 @@ class WorkoutResponse(WorkoutBase):
 
     class Config:
         from_attributes = True
+
+
+class WorkoutPage(BaseModel):
+    items: List[WorkoutResponse]
+    next_cursor: Optional[str] = None
+
+
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+
+class ImportResult(BaseModel):
+    rows: int
+    workouts_imported: int
+    exercises_imported: int
+    # Workouts (or CSV rows) skipped because their date already has a workout
+    duplicates: int
+    error_count: int
+    errors: List[ImportRowError]
+    elapsed_seconds: float
+    rows_per_second: float
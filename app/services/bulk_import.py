@@ -0,0 +1,370 @@
+"""Streaming bulk import of workout history.
+
+The request body is consumed line by line, each row is validated against
+WorkoutCreate/ExerciseCreate, and workouts are written in batches with
+multi-row INSERT ... VALUES statements of up to INSERT_CHUNK_ROWS rows.
+Only the current batch and the set of dates already seen are kept in
+memory, whatever the size of the upload. Dates that already have a workout
+are skipped (ON CONFLICT DO NOTHING) and counted as duplicates.
+
+NDJSON: one WorkoutCreate object per line.
+CSV: a header line, then one exercise per row using CSV_COLUMNS. Quoted
+fields may span lines. Consecutive rows sharing a date form one workout; a
+row without a name adds a workout with no exercises.
+"""
+import codecs
+import csv
+import math
+import time
+import uuid
+from collections import deque
+from datetime import date, datetime, timedelta
+from typing import AnyStr, AsyncIterator, Deque, Dict, Iterator, List, Optional, Set, Tuple
+from uuid import UUID
+
+from pydantic import ValidationError
+from sqlalchemy import Insert
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.query_budget import count_queries
+from app.models.exercise import Exercise
+from app.models.workout import Workout
+from app.schemas.workout import WorkoutCreate
+from app.services.records import RecordsDelta
+from app.services.rollup import RollupDelta
+from app.services.streak import recompute_streak
+from app.services.versioning import bump_data_version
+
+CSV_COLUMNS = ["date", "workout_notes", "name", "muscle_group", "sets", "reps", "weight", "notes"]
+REQUIRED_CSV_COLUMNS = {"date"}
+MAX_REPORTED_ERRORS = 100
+# Longest line (or CSV record) accepted, so one row cannot exhaust memory
+MAX_LINE_LENGTH = 1 << 20
+# Version bump, two INSERTs, rollup and records upserts, streak recompute (2);
+# plus an INSERT per INSERT_CHUNK_ROWS workouts or exercises past the first
+BATCH_QUERY_BUDGET = 7
+# Rows per multi-row INSERT: 1000 exercises take 9000 of Postgres' 32767 bind parameters
+INSERT_CHUNK_ROWS = 1000
+
+
+class LineTooLong(ValueError):
+    """A line, or a CSV record spanning lines, longer than MAX_LINE_LENGTH"""
+
+    def __init__(self, line: int):
+        super().__init__(f"line is longer than {MAX_LINE_LENGTH} characters")
+        self.line = line
+
+
+async def iter_lines(chunks: AsyncIterator[AnyStr]) -> AsyncIterator[Tuple[int, AnyStr]]:
+    """Split a stream of bytes or text into (line number, line), line ending included.
+
+    Only the line being read is buffered, and each chunk is scanned once.
+    Raises LineTooLong rather than buffer a line over MAX_LINE_LENGTH.
+    """
+    pieces: list = []
+    length = 0
+    line_no = 0
+    async for chunk in chunks:
+        newline = b"\n" if isinstance(chunk, bytes) else "\n"
+        start = 0
+        end = chunk.find(newline)
+        while end != -1:
+            line_no += 1
+            if length + end + 1 - start > MAX_LINE_LENGTH:
+                raise LineTooLong(line_no)
+            pieces.append(chunk[start:end + 1])
+            yield line_no, chunk[:0].join(pieces)
+            pieces, length = [], 0
+            start = end + 1
+            end = chunk.find(newline, start)
+        if start < len(chunk):
+            length += len(chunk) - start
+            if length > MAX_LINE_LENGTH:
+                raise LineTooLong(line_no + 1)
+            pieces.append(chunk[start:])
+    if pieces:
+        yield line_no + 1, pieces[0][:0].join(pieces)
+
+
+async def _decode(chunks: AsyncIterator[bytes], encoding: str) -> AsyncIterator[str]:
+    # Incremental, so characters split across chunks decode whole; invalid
+    # bytes become U+FFFD and the rows holding them are reported
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    async for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield text
+
+
+def _in_quotes_after(line: str, in_quotes: bool) -> bool:
+    """Whether csv's default dialect is inside a quoted field at the end of line.
+
+    A quote opens a quoted field only at the start of a field; inside one, a
+    doubled quote is an escaped quote and a single one closes it. Elsewhere
+    a quote is an ordinary character.
+    """
+    position = line.find('"')
+    while position != -1:
+        if in_quotes:
+            if line.startswith('"', position + 1):
+                position += 1
+            else:
+                in_quotes = False
+        elif position == 0 or line[position - 1] == ",":
+            in_quotes = True
+        position = line.find('"', position + 1)
+    return in_quotes
+
+
+async def iter_csv_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, str]]:
+    """Group decoded lines into (first line number, record) CSV records.
+
+    A quoted field may hold newlines, so a record ends at the first line
+    ending outside quotes.
+    """
+    lines: List[str] = []
+    length = 0
+    in_quotes = False
+    first = 0
+    async for line_no, line in iter_lines(_decode(chunks, "utf-8-sig")):
+        if not lines:
+            first = line_no
+        lines.append(line)
+        length += len(line)
+        if length > MAX_LINE_LENGTH:
+            raise LineTooLong(first)
+        in_quotes = _in_quotes_after(line, in_quotes)
+        if not in_quotes:
+            yield first, "".join(lines)
+            lines, length = [], 0
+    if lines:
+        yield first, "".join(lines)
+
+
+def _format_validation_error(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}"
+        for error in exc.errors(include_url=False)
+    )
+
+
+async def _insert_rows(db: AsyncSession, statement: Insert, rows: List[Dict]) -> Set[UUID]:
+    """Run an INSERT of rows, returning the ids of those inserted"""
+    # With RETURNING, SQLAlchemy sends the rows as multi-row INSERT ... VALUES
+    # of INSERT_CHUNK_ROWS each ("insertmanyvalues"); without it, asyncpg's
+    # executemany runs the INSERT once per row
+    if not rows:
+        return set()
+    result = await db.execute(
+        statement.returning(statement.table.c.id).execution_options(insertmanyvalues_page_size=INSERT_CHUNK_ROWS),
+        rows,
+    )
+    return set(result.scalars())
+
+
+class WorkoutImporter:
+    def __init__(self, db: AsyncSession, user_id: UUID, batch_size: int, merge_consecutive: bool = False):
+        self.db = db
+        self.user_id = user_id
+        self.batch_size = batch_size
+        # CSV spreads one workout over several rows; NDJSON lines are complete
+        self.merge_consecutive = merge_consecutive
+        self.started = time.perf_counter()
+
+        self.rows = 0
+        self.workouts_imported = 0
+        self.exercises_imported = 0
+        self.duplicates = 0
+        self.error_count = 0
+        self.errors: List[Dict] = []
+
+        self._seen_dates: Set[date] = set()
+        self._pending: Optional[WorkoutCreate] = None
+        self._batch: List[WorkoutCreate] = []
+
+    def error(self, line: int, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    async def add(self, workout: WorkoutCreate) -> None:
+        if self.merge_consecutive and self._pending is not None and self._pending.date == workout.date:
+            self._pending.exercises.extend(workout.exercises or [])
+            if not self._pending.notes:
+                self._pending.notes = workout.notes
+            return
+        await self._enqueue_pending()
+        if workout.date in self._seen_dates:
+            self.duplicates += 1
+            return
+        self._seen_dates.add(workout.date)
+        self._pending = workout
+
+    async def _enqueue_pending(self) -> None:
+        if self._pending is not None:
+            self._batch.append(self._pending)
+            self._pending = None
+            if len(self._batch) >= self.batch_size:
+                await self.flush()
+
+    async def flush(self) -> None:
+        batch, self._batch = self._batch, []
+        if not batch:
+            return
+        # Budgeted per batch: the request as a whole scales with the upload
+        exercises = sum(len(workout.exercises or []) for workout in batch)
+        budget = BATCH_QUERY_BUDGET + sum(
+            max(0, math.ceil(rows / INSERT_CHUNK_ROWS) - 1) for rows in (len(batch), exercises)
+        )
+        with count_queries(budget=budget, label="import batch"):
+            await self._write(batch)
+
+    async def _write(self, batch: List[WorkoutCreate]) -> None:
+        version = await bump_data_version(self.db, self.user_id)
+        workout_ids = [uuid.uuid4() for _ in batch]
+        # Dates that already have a workout, including ones added since the
+        # import started, are skipped by the unique (user_id, date) index
+        inserted = await _insert_rows(
+            self.db,
+            insert(Workout.__table__).on_conflict_do_nothing(index_elements=["user_id", "date"]),
+            [
+                {
+                    "id": workout_id,
+                    "user_id": self.user_id,
+                    "date": workout.date,
+                    "notes": workout.notes,
+                    "sync_seq": version,
+                }
+                for workout_id, workout in zip(workout_ids, batch)
+            ],
+        )
+        self.duplicates += len(batch) - len(inserted)
+        if not inserted:
+            # Nothing changed, so neither should the data version
+            await self.db.rollback()
+            return
+
+        rollup = RollupDelta()
+        records = RecordsDelta()
+        exercise_rows = []
+        # One microsecond apart, so the export lists exercises in upload order
+        created_at = datetime.utcnow()
+        for workout_id, workout in zip(workout_ids, batch):
+            if workout_id not in inserted:
+                continue
+            for exercise in workout.exercises or []:
+                exercise_rows.append({
+                    "id": uuid.uuid4(),
+                    "workout_id": workout_id,
+                    "name": exercise.name,
+                    "muscle_group": exercise.muscle_group,
+                    "sets": exercise.sets,
+                    "reps": exercise.reps,
+                    "weight": exercise.weight,
+                    "notes": exercise.notes,
+                    "created_at": created_at + timedelta(microseconds=len(exercise_rows)),
+                    "sync_seq": version,
+                })
+                rollup.add(workout.date, exercise)
+                records.add(workout.date, exercise)
+
+        await _insert_rows(self.db, insert(Exercise.__table__), exercise_rows)
+        await rollup.apply(self.db, self.user_id)
+        await records.apply(self.db, self.user_id)
+        await recompute_streak(self.db, self.user_id)
+        await self.db.commit()
+
+        self.workouts_imported += len(inserted)
+        self.exercises_imported += len(exercise_rows)
+
+    async def finish(self) -> Dict:
+        await self._enqueue_pending()
+        await self.flush()
+        elapsed = time.perf_counter() - self.started
+        return {
+            "rows": self.rows,
+            "workouts_imported": self.workouts_imported,
+            "exercises_imported": self.exercises_imported,
+            "duplicates": self.duplicates,
+            "error_count": self.error_count,
+            "errors": self.errors,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(self.rows / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+
+def _drain(pending: Deque[str]) -> Iterator[str]:
+    # Ends only if the reader wants more than the record it was given, which
+    # an unclosed quote at the end of the upload does. The strict reader then
+    # raises "unexpected end of data" rather than return the partial row
+    while pending:
+        yield pending.popleft()
+
+
+async def import_ndjson(importer: WorkoutImporter, chunks: AsyncIterator[bytes]) -> Dict:
+    try:
+        async for line_no, line in iter_lines(chunks):
+            if not line.strip():
+                continue
+            importer.rows += 1
+            try:
+                workout = WorkoutCreate.model_validate_json(line)
+            except ValidationError as exc:
+                importer.error(line_no, _format_validation_error(exc))
+                continue
+            await importer.add(workout)
+    except LineTooLong as exc:
+        importer.error(exc.line, str(exc))
+    return await importer.finish()
+
+
+async def import_csv(importer: WorkoutImporter, chunks: AsyncIterator[bytes]) -> Dict:
+    # One reader for the whole upload, fed a complete record at a time
+    pending: Deque[str] = deque()
+    reader = csv.reader(_drain(pending), strict=True)
+    header: Optional[List[str]] = None
+    try:
+        async for line_no, text in iter_csv_records(chunks):
+            if not text.strip():
+                continue
+            if "\ufffd" in text:
+                importer.error(line_no, "row is not valid UTF-8")
+                continue
+            pending.append(text)
+            try:
+                values = next(reader, None)
+            except csv.Error as exc:
+                importer.error(line_no, f"invalid CSV: {exc}")
+                continue
+            if values is None:
+                importer.error(line_no, "invalid CSV: unexpected end of data")
+                break
+
+            if header is None:
+                header = [column.strip() for column in values]
+                missing = REQUIRED_CSV_COLUMNS - set(header)
+                if missing:
+                    importer.error(line_no, f"header is missing columns: {', '.join(sorted(missing))}")
+                    break
+                continue
+
+            importer.rows += 1
+            row = {column: (value or None) for column, value in zip(header, values)}
+            exercise = {key: row.get(key) for key in ("name", "muscle_group", "sets", "reps", "weight", "notes")}
+            try:
+                workout = WorkoutCreate.model_validate({
+                    "date": row.get("date"),
+                    "notes": row.get("workout_notes"),
+                    "exercises": [exercise] if exercise["name"] else [],
+                })
+            except ValidationError as exc:
+                importer.error(line_no, _format_validation_error(exc))
+                continue
+            await importer.add(workout)
+    except LineTooLong as exc:
+        importer.error(exc.line, str(exc))
+    return await importer.finish()
@@ -0,0 +1,124 @@
+"""Streaming export of a user's full workout history.
+
+One joined query runs on a server-side cursor and rows are turned into
+NDJSON or CSV as they arrive, so memory use does not depend on history size
+and the first bytes go out before the query has finished. The formats match
+what /workouts/import accepts, and `python -m benchmarks.export_roundtrip`
+checks that both import back unchanged. CSV has no null, so empty notes come
+back as null.
+"""
+import csv
+import io
+import json
+from typing import AsyncIterator, Dict, List, Optional
+from uuid import UUID
+
+from sqlalchemy import select
+
+from app.db import database
+from app.models.exercise import Exercise
+from app.models.workout import Workout
+from app.services.bulk_import import CSV_COLUMNS
+
+# Rows fetched per round trip from the server-side cursor
+YIELD_PER = 1000
+
+
+def _export_query(user_id: UUID):
+    return select(
+        Workout.id,
+        Workout.date,
+        Workout.notes,
+        Workout.user_id,
+        Workout.created_at,
+        Exercise.id.label("exercise_id"),
+        Exercise.name,
+        Exercise.muscle_group,
+        Exercise.sets,
+        Exercise.reps,
+        Exercise.weight,
+        Exercise.notes.label("exercise_notes"),
+        Exercise.created_at.label("exercise_created_at"),
+    ).outerjoin(
+        Exercise, Exercise.workout_id == Workout.id
+    ).where(
+        Workout.user_id == user_id
+    ).order_by(
+        Workout.date, Workout.id, Exercise.created_at, Exercise.id
+    ).execution_options(yield_per=YIELD_PER)
+
+
+def _workout_json(row) -> Dict:
+    # Same shape as WorkoutResponse
+    return {
+        "date": row.date.isoformat(),
+        "notes": row.notes,
+        "id": str(row.id),
+        "user_id": str(row.user_id),
+        "created_at": row.created_at.isoformat(),
+        "exercises": [],
+    }
+
+
+def _exercise_json(row) -> Dict:
+    # Same shape as ExerciseResponse
+    return {
+        "name": row.name,
+        "muscle_group": row.muscle_group.value,
+        "sets": row.sets,
+        "reps": row.reps,
+        "weight": row.weight,
+        "notes": row.exercise_notes,
+        "id": str(row.exercise_id),
+        "workout_id": str(row.id),
+        "created_at": row.exercise_created_at.isoformat(),
+    }
+
+
+def _dumps(workout: Dict) -> str:
+    return json.dumps(workout, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+async def stream_ndjson(user_id: UUID) -> AsyncIterator[bytes]:
+    async with database.ReadSessionLocal() as db:
+        result = await db.stream(_export_query(user_id))
+        current: Optional[Dict] = None
+        async for partition in result.partitions():
+            lines: List[str] = []
+            for row in partition:
+                if current is None or current["id"] != str(row.id):
+                    if current is not None:
+                        lines.append(_dumps(current))
+                    current = _workout_json(row)
+                if row.exercise_id is not None:
+                    current["exercises"].append(_exercise_json(row))
+            if lines:
+                yield "".join(lines).encode()
+        if current is not None:
+            yield _dumps(current).encode()
+
+
+async def stream_csv(user_id: UUID) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(CSV_COLUMNS)
+    yield buffer.getvalue().encode()
+
+    async with database.ReadSessionLocal() as db:
+        result = await db.stream(_export_query(user_id))
+        async for partition in result.partitions():
+            buffer.seek(0)
+            buffer.truncate()
+            for row in partition:
+                has_exercise = row.exercise_id is not None
+                writer.writerow([
+                    row.date.isoformat(),
+                    row.notes,
+                    row.name if has_exercise else None,
+                    row.muscle_group.value if has_exercise else None,
+                    row.sets,
+                    row.reps,
+                    row.weight,
+                    row.exercise_notes,
+                ])
+            yield buffer.getvalue().encode()
@@ -0,0 +1,269 @@
+"""Maintenance of the personal_records table.
+
+Writers collect exercise changes in a RecordsDelta and apply it before
+committing, like RollupDelta. Added exercises are merged into the stored
+bests with one upsert. A removed exercise (deleted, edited or moved to
+another date) only decrements use_count unless it held or tied a best,
+was the latest performance or the last of its name. In that case the
+exercise's record is rebuilt from the user's remaining exercises of that
+name.
+
+Names are normalized in SQL only (see exercise_key), so the key stored for
+a record always matches the key computed for the exercises it summarizes.
+"""
+from datetime import date
+from typing import Dict, List, Optional
+from uuid import UUID
+
+from sqlalchemy import (
+    Date, Integer, String, and_, case, cast, column, delete, func, literal, not_, null, or_, select, update, values
+)
+from sqlalchemy.dialects.postgresql import aggregate_order_by, array_agg, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.exercise import Exercise
+from app.models.stats import PersonalRecord
+from app.models.workout import Workout
+
+RECORD_COLUMNS = [
+    "user_id", "exercise_key", "name",
+    "max_weight", "max_weight_date", "max_reps", "max_reps_date",
+    "max_volume", "max_volume_date", "last_performed", "use_count",
+]
+
+
+def exercise_key(name):
+    """SQL expression grouping spellings of one exercise name"""
+    # Constants are rendered inline so SELECT and GROUP BY share one expression
+    whitespace, space, flags = (literal(value, literal_execute=True) for value in (r"\s+", " ", "g"))
+    return func.lower(func.btrim(func.regexp_replace(name, whitespace, space, flags)))
+
+
+def _best(value, day):
+    """max(value) and the earliest day it was reached"""
+    first_day = array_agg(aggregate_order_by(day, value.desc().nulls_last(), day))[1]
+    return func.max(value), case((func.max(value).is_(None), null()), else_=first_day)
+
+
+def _aggregate(source, user_id):
+    """One record per exercise_key from rows of (name, weight, reps, volume, day)"""
+    key = exercise_key(source.c.name)
+    max_weight, max_weight_date = _best(source.c.weight, source.c.day)
+    max_reps, max_reps_date = _best(source.c.reps, source.c.day)
+    max_volume, max_volume_date = _best(source.c.volume, source.c.day)
+    columns = [
+        user_id,
+        key,
+        array_agg(aggregate_order_by(source.c.name, source.c.day.desc(), source.c.name))[1],
+        max_weight, max_weight_date,
+        max_reps, max_reps_date,
+        max_volume, max_volume_date,
+        func.max(source.c.day),
+        func.count(),
+    ]
+    return select(*(c.label(name) for c, name in zip(columns, RECORD_COLUMNS))).group_by(key)
+
+
+def _raw_rows(user_id: Optional[UUID] = None):
+    query = select(
+        Workout.user_id,
+        Exercise.name,
+        Exercise.weight,
+        Exercise.reps,
+        Exercise.volume,
+        Workout.date.label("day"),
+    ).join(Workout, Exercise.workout_id == Workout.id)
+    if user_id is not None:
+        query = query.where(Workout.user_id == user_id)
+    return query
+
+
+def _beats(new, new_day, current, current_day):
+    return or_(
+        and_(current.is_(None), new.isnot(None)),
+        new > current,
+        and_(new == current, new_day < current_day),
+    )
+
+
+class RecordsDelta:
+    """Accumulates added and removed exercises to apply in a few statements"""
+
+    def __init__(self) -> None:
+        self._added: List[Dict] = []
+        self._removed: List[Dict] = []
+
+    @staticmethod
+    def _row(day: date, exercise) -> Dict:
+        return {
+            "name": exercise.name,
+            "weight": exercise.weight,
+            "reps": exercise.reps,
+            "volume": exercise.sets * exercise.reps,
+            "day": day,
+        }
+
+    def add(self, day: date, exercise) -> None:
+        self._added.append(self._row(day, exercise))
+
+    def remove(self, day: date, exercise) -> None:
+        self._removed.append(self._row(day, exercise))
+
+    @staticmethod
+    def _values(rows: List[Dict], name: str):
+        data = values(
+            column("name", String), column("weight", Integer), column("reps", Integer),
+            column("volume", Integer), column("day", Date),
+            name=f"{name}_rows",
+        ).data([(r["name"], r["weight"], r["reps"], r["volume"], r["day"]) for r in rows])
+        # None renders as an untyped NULL, which makes an all-bodyweight weight column text
+        return select(
+            data.c.name, cast(data.c.weight, Integer).label("weight"), data.c.reps, data.c.volume, data.c.day
+        ).subquery(name)
+
+    async def apply(self, db: AsyncSession, user_id: UUID) -> None:
+        added, self._added = self._added, []
+        removed, self._removed = self._removed, []
+
+        user = literal(user_id, PersonalRecord.user_id.type)
+        rebuilt: List[str] = []
+        if removed:
+            # The rebuild reads the exercises table, so pending ORM changes must be in it
+            await db.flush()
+            gone = self._values(removed, "removed_exercises")
+            key = exercise_key(gone.c.name)
+            by_key = select(
+                key.label("exercise_key"),
+                func.count().label("use_count"),
+                func.max(gone.c.weight).label("weight"),
+                func.max(gone.c.reps).label("reps"),
+                func.max(gone.c.volume).label("volume"),
+                func.max(gone.c.day).label("day"),
+            ).group_by(key).cte("removed_by_key")
+            record = PersonalRecord
+            matches = and_(record.user_id == user_id, record.exercise_key == by_key.c.exercise_key)
+            stale = func.coalesce(or_(
+                by_key.c.weight >= record.max_weight,
+                by_key.c.reps >= record.max_reps,
+                by_key.c.volume >= record.max_volume,
+                by_key.c.day >= record.last_performed,
+                by_key.c.use_count >= record.use_count,
+            ), False)
+            # One statement: records the removals cannot have changed only lose
+            # their count; the others are deleted and returned for a rebuild
+            decremented = update(record).where(matches, not_(stale)).values(
+                use_count=record.use_count - by_key.c.use_count
+            ).returning(record.exercise_key).cte("decremented")
+            rebuilt = list(await db.scalars(
+                delete(record).where(matches, stale).returning(record.exercise_key).add_cte(decremented),
+                execution_options={"synchronize_session": False},
+            ))
+            if rebuilt:
+                # Also covers any additions to these exercises, which are flushed
+                # by now. Materialized so the key filter runs on this user's rows
+                # only; inlined, Postgres applies it to every exercise first
+                rows = _raw_rows(user_id).cte("user_exercises").prefix_with("MATERIALIZED")
+                remaining = select(rows).where(exercise_key(rows.c.name).in_(rebuilt)).subquery()
+                await _upsert(db, _aggregate(remaining, user), merge=False)
+
+        if added:
+            new = self._values(added, "added_exercises")
+            query = _aggregate(new, user)
+            if rebuilt:
+                query = query.where(exercise_key(new.c.name).notin_(rebuilt))
+            await _upsert(db, query, merge=True)
+
+
+async def _upsert(db: AsyncSession, query, merge: bool) -> None:
+    """Insert records, merging them into existing ones or replacing them"""
+    stmt = insert(PersonalRecord).from_select(RECORD_COLUMNS, query)
+    new = stmt.excluded
+    record = PersonalRecord
+    if merge:
+        updates = {
+            "last_performed": func.greatest(record.last_performed, new.last_performed),
+            "use_count": record.use_count + new.use_count,
+        }
+        updates["name"] = case(
+            (_beats(new.last_performed, new.name, record.last_performed, record.name), new.name),
+            else_=record.name,
+        )
+        for value in ("max_weight", "max_reps", "max_volume"):
+            current, incoming = getattr(record, value), getattr(new, value)
+            current_day, incoming_day = getattr(record, f"{value}_date"), getattr(new, f"{value}_date")
+            updates[value] = func.greatest(current, incoming)
+            updates[f"{value}_date"] = case(
+                (_beats(incoming, incoming_day, current, current_day), incoming_day), else_=current_day
+            )
+    else:
+        updates = {name: getattr(new, name) for name in RECORD_COLUMNS[2:]}
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[PersonalRecord.user_id, PersonalRecord.exercise_key], set_=updates
+    ))
+
+
+def autocomplete(user_id: UUID, text: str, limit: int):
+    """Select the user's exercise names with a word starting with text.
+
+    Names starting with text come first, then the rest, each by how often
+    and how recently they were logged. The user's records are one primary
+    key range, so this reads one row per distinct name.
+    """
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    prefix = exercise_key(literal(escaped, String))
+    starts = PersonalRecord.exercise_key.like(prefix + "%")
+    return select(
+        PersonalRecord.name, PersonalRecord.use_count, PersonalRecord.last_performed
+    ).where(
+        PersonalRecord.user_id == user_id,
+        or_(starts, PersonalRecord.exercise_key.like("% " + prefix + "%")),
+    ).order_by(
+        starts.desc(),
+        PersonalRecord.use_count.desc(),
+        PersonalRecord.last_performed.desc(),
+        PersonalRecord.exercise_key,
+    ).limit(limit)
+
+
+async def rebuild_records(db: AsyncSession, user_id: Optional[UUID] = None) -> int:
+    """Recompute personal_records from workouts/exercises; returns rows written"""
+    stmt = delete(PersonalRecord)
+    if user_id is not None:
+        stmt = stmt.where(PersonalRecord.user_id == user_id)
+    await db.execute(stmt)
+
+    raw = _raw_rows(user_id).subquery()
+    query = _aggregate(raw, raw.c.user_id).group_by(raw.c.user_id)
+    result = await db.execute(insert(PersonalRecord).from_select(RECORD_COLUMNS, query))
+    return result.rowcount
+
+
+async def check_records(db: AsyncSession, user_id: Optional[UUID] = None) -> List[Dict]:
+    """Compare personal_records against the raw tables and return every mismatch"""
+    raw = _raw_rows(user_id).subquery()
+    expected = _aggregate(raw, raw.c.user_id).group_by(raw.c.user_id).subquery()
+    stored = select(PersonalRecord)
+    if user_id is not None:
+        stored = stored.where(PersonalRecord.user_id == user_id)
+    stored = stored.subquery()
+
+    results = await db.execute(
+        select(
+            func.coalesce(expected.c.user_id, stored.c.user_id).label("user_id"),
+            func.coalesce(expected.c.exercise_key, stored.c.exercise_key).label("exercise_key"),
+            *(expected.c[name].label(f"expected_{name}") for name in RECORD_COLUMNS[2:]),
+            *(stored.c[name].label(f"actual_{name}") for name in RECORD_COLUMNS[2:]),
+        ).select_from(
+            expected.join(
+                stored,
+                and_(
+                    expected.c.user_id == stored.c.user_id,
+                    expected.c.exercise_key == stored.c.exercise_key,
+                ),
+                full=True,
+            )
+        ).where(
+            or_(*(expected.c[name].is_distinct_from(stored.c[name]) for name in RECORD_COLUMNS[2:]))
+        )
+    )
+    return [dict(r._mapping) for r in results]
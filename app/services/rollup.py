@@ -0,0 +1,143 @@
+"""Maintenance of the daily_stats rollup table.
+
+Writers collect their changes in a RollupDelta and apply it before
+committing, so the rollup always moves in the same transaction as the
+workouts and exercises it summarizes.
+"""
+from collections import defaultdict
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import and_, delete, func, or_, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.exercise import Exercise, MuscleGroup
+from app.models.stats import DailyStats
+from app.models.workout import Workout
+
+
+class RollupDelta:
+    """Accumulates per-(date, muscle group) changes to apply as one upsert"""
+
+    def __init__(self) -> None:
+        self._rows: Dict[Tuple[date, MuscleGroup], List[int]] = defaultdict(lambda: [0, 0, 0])
+
+    def add(self, day: date, exercise: Exercise, sign: int = 1) -> None:
+        row = self._rows[(day, MuscleGroup(exercise.muscle_group))]
+        row[0] += sign
+        row[1] += sign * exercise.sets * exercise.reps
+        row[2] += sign * exercise.sets * exercise.reps * (exercise.weight or 0)
+
+    def remove(self, day: date, exercise: Exercise) -> None:
+        self.add(day, exercise, sign=-1)
+
+    async def apply(self, db: AsyncSession, user_id: UUID) -> None:
+        rows = [
+            {
+                "user_id": user_id,
+                "date": day,
+                "muscle_group": muscle_group,
+                "exercise_count": exercise_count,
+                "volume": volume,
+                "tonnage": tonnage,
+            }
+            for (day, muscle_group), (exercise_count, volume, tonnage) in self._rows.items()
+            if exercise_count or volume or tonnage
+        ]
+        self._rows.clear()
+        if not rows:
+            return
+
+        stmt = insert(DailyStats).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[DailyStats.user_id, DailyStats.date, DailyStats.muscle_group],
+            set_={
+                "exercise_count": DailyStats.exercise_count + stmt.excluded.exercise_count,
+                "volume": DailyStats.volume + stmt.excluded.volume,
+                "tonnage": DailyStats.tonnage + stmt.excluded.tonnage,
+            },
+        )
+        await db.execute(stmt)
+
+        shrunk = {row["date"] for row in rows if row["exercise_count"] < 0}
+        if shrunk:
+            await db.execute(
+                delete(DailyStats).where(
+                    DailyStats.user_id == user_id,
+                    DailyStats.date.in_(shrunk),
+                    DailyStats.exercise_count <= 0
+                )
+            )
+
+
+def _raw_totals(user_id: Optional[UUID] = None):
+    """Aggregate the raw tables into the rollup's shape"""
+    query = select(
+        Workout.user_id,
+        Workout.date,
+        Exercise.muscle_group,
+        func.count(Exercise.id).label("exercise_count"),
+        func.sum(Exercise.volume).label("volume"),
+        func.sum(Exercise.tonnage).label("tonnage"),
+    ).join(Exercise, Exercise.workout_id == Workout.id)
+    if user_id is not None:
+        query = query.where(Workout.user_id == user_id)
+    return query.group_by(Workout.user_id, Workout.date, Exercise.muscle_group)
+
+
+async def rebuild_rollup(db: AsyncSession, user_id: Optional[UUID] = None) -> int:
+    """Recompute the rollup from workouts/exercises; returns rows written"""
+    stmt = delete(DailyStats)
+    if user_id is not None:
+        stmt = stmt.where(DailyStats.user_id == user_id)
+    await db.execute(stmt)
+
+    result = await db.execute(
+        insert(DailyStats).from_select(
+            ["user_id", "date", "muscle_group", "exercise_count", "volume", "tonnage"],
+            _raw_totals(user_id),
+        )
+    )
+    return result.rowcount
+
+
+async def check_rollup(db: AsyncSession, user_id: Optional[UUID] = None) -> List[Dict]:
+    """Compare the rollup against the raw tables and return every mismatch"""
+    raw = _raw_totals(user_id).subquery()
+    rollup = select(DailyStats)
+    if user_id is not None:
+        rollup = rollup.where(DailyStats.user_id == user_id)
+    rollup = rollup.subquery()
+
+    results = await db.execute(
+        select(
+            func.coalesce(raw.c.user_id, rollup.c.user_id).label("user_id"),
+            func.coalesce(raw.c.date, rollup.c.date).label("date"),
+            func.coalesce(raw.c.muscle_group, rollup.c.muscle_group).label("muscle_group"),
+            raw.c.exercise_count.label("expected_exercise_count"),
+            rollup.c.exercise_count.label("actual_exercise_count"),
+            raw.c.volume.label("expected_volume"),
+            rollup.c.volume.label("actual_volume"),
+            raw.c.tonnage.label("expected_tonnage"),
+            rollup.c.tonnage.label("actual_tonnage"),
+        ).select_from(
+            raw.join(
+                rollup,
+                and_(
+                    raw.c.user_id == rollup.c.user_id,
+                    raw.c.date == rollup.c.date,
+                    raw.c.muscle_group == rollup.c.muscle_group,
+                ),
+                full=True,
+            )
+        ).where(
+            or_(
+                raw.c.exercise_count.is_distinct_from(rollup.c.exercise_count),
+                raw.c.volume.is_distinct_from(rollup.c.volume),
+                raw.c.tonnage.is_distinct_from(rollup.c.tonnage),
+            )
+        )
+    )
+    return [dict(r._mapping) for r in results]
@@ -0,0 +1,41 @@
+"""Workout and exercise rows as response-shaped dicts.
+
+The columns are selected in the field order of WorkoutResponse and
+ExerciseResponse, and each column is labelled with its field name. Each
+row maps directly onto the schema without building ORM objects.
+"""
+from typing import Dict, List
+
+from sqlalchemy import select
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.exercise import Exercise
+from app.models.workout import Workout
+
+WORKOUT_COLUMNS = (Workout.date, Workout.notes, Workout.id, Workout.user_id, Workout.created_at)
+EXERCISE_COLUMNS = (
+    Exercise.name,
+    Exercise.muscle_group,
+    Exercise.sets,
+    Exercise.reps,
+    Exercise.weight,
+    Exercise.notes,
+    Exercise.id,
+    Exercise.workout_id,
+    Exercise.created_at,
+)
+
+
+def workout_dict(row: Row) -> Dict:
+    return dict(row._mapping, exercises=[])
+
+
+async def attach_exercises(db: AsyncSession, workouts: List[Dict]) -> List[Dict]:
+    """Fill in each workout's exercises with a single IN query"""
+    if workouts:
+        by_id = {workout["id"]: workout["exercises"] for workout in workouts}
+        rows = await db.execute(select(*EXERCISE_COLUMNS).where(Exercise.workout_id.in_(by_id)))
+        for row in rows:
+            by_id[row.workout_id].append(row._asdict())
+    return workouts
@@ -0,0 +1,169 @@
+"""Workout streak state.
+
+The user_streaks row tracks the most recent run of consecutive workout days
+and the longest run ever. Adding a day at the end of the history (the usual
+case) or trimming the ends of the latest run is handled incrementally; any
+other change falls back to one gaps-and-islands query over the user's dates.
+"""
+from datetime import date, timedelta
+from typing import Dict, Iterable, Optional
+from uuid import UUID
+
+from sqlalchemy import Integer, cast, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.stats import UserStreak
+from app.models.workout import Workout
+
+ONE_DAY = timedelta(days=1)
+
+
+def compute_streak(dates: Iterable[date], today: date) -> Dict:
+    """Reference implementation that walks every workout date.
+
+    This is the original /stats/streak algorithm, kept to check the
+    persisted state against.
+    """
+    workout_dates = set(dates)
+    if not workout_dates:
+        return {"current_streak": 0, "longest_streak": 0}
+
+    # Calculate current streak
+    current_streak = 0
+    check_date = today
+    while check_date in workout_dates or (check_date == today and (today - ONE_DAY) in workout_dates):
+        if check_date in workout_dates:
+            current_streak += 1
+        check_date -= ONE_DAY
+        if check_date not in workout_dates and check_date != today:
+            break
+
+    # Calculate longest streak
+    sorted_dates = sorted(workout_dates)
+    longest_streak = 1
+    current = 1
+    for i in range(1, len(sorted_dates)):
+        if (sorted_dates[i] - sorted_dates[i-1]).days == 1:
+            current += 1
+            longest_streak = max(longest_streak, current)
+        else:
+            current = 1
+
+    return {
+        "current_streak": current_streak,
+        "longest_streak": longest_streak if sorted_dates else 0
+    }
+
+
+def current_streak(state: UserStreak, today: date) -> Optional[int]:
+    """Current streak from the persisted run, or None if it cannot tell.
+
+    The latest run only answers the question when it reaches today or
+    yesterday; a run that lies entirely in the future hides whatever run
+    ends today, so the caller has to fall back to the full computation.
+    """
+    if state.run_end is None or state.run_end < today - ONE_DAY:
+        return 0
+    if state.run_start > today:
+        return None
+    return (min(state.run_end, today) - state.run_start).days + 1
+
+
+def _advance(state: UserStreak, added: Optional[date], removed: Optional[date]) -> bool:
+    """Apply a change to the state in place; False if it needs a recompute"""
+    run_start, run_end, longest = state.run_start, state.run_end, state.longest_streak
+
+    if removed is not None:
+        if run_end is None or removed < run_start:
+            # An older run changed and it may have been the longest one
+            return False
+        if removed <= run_end:
+            length = (run_end - run_start).days + 1
+            if length == 1 or length == longest or run_start < removed < run_end:
+                return False
+            if removed == run_end:
+                run_end -= ONE_DAY
+            else:
+                run_start += ONE_DAY
+
+    if added is not None:
+        if run_end is None or added > run_end + ONE_DAY:
+            run_start = run_end = added
+        elif added == run_end + ONE_DAY:
+            run_end = added
+        elif added < run_start:
+            # May bridge older runs we do not track
+            return False
+        longest = max(longest, (run_end - run_start).days + 1)
+
+    state.run_start, state.run_end, state.longest_streak = run_start, run_end, longest
+    return True
+
+
+async def _latest_run(db: AsyncSession, user_id: UUID) -> Dict:
+    """The latest run and the longest run length, via one gaps-and-islands query"""
+    days = select(Workout.date.label("day")).where(Workout.user_id == user_id).distinct().subquery()
+    islands = select(
+        days.c.day,
+        (days.c.day - cast(func.row_number().over(order_by=days.c.day), Integer)).label("island")
+    ).subquery()
+    runs = select(
+        func.min(islands.c.day).label("run_start"),
+        func.max(islands.c.day).label("run_end"),
+        func.count().label("length")
+    ).group_by(islands.c.island).subquery()
+    latest = (await db.execute(
+        select(
+            runs.c.run_start,
+            runs.c.run_end,
+            func.max(runs.c.length).over().label("longest_streak")
+        ).order_by(runs.c.run_end.desc()).limit(1)
+    )).first()
+
+    return {
+        "run_start": latest.run_start if latest else None,
+        "run_end": latest.run_end if latest else None,
+        "longest_streak": latest.longest_streak if latest else 0,
+    }
+
+
+async def recompute_streak(db: AsyncSession, user_id: UUID) -> UserStreak:
+    """Rebuild a user's streak state with a single gaps-and-islands query"""
+    # Pending workout changes must be visible to the query below
+    await db.flush()
+    values = await _latest_run(db, user_id)
+    stmt = insert(UserStreak).values(user_id=user_id, **values)
+    await db.execute(stmt.on_conflict_do_update(index_elements=[UserStreak.user_id], set_=values))
+    return UserStreak(user_id=user_id, **values)
+
+
+async def get_streak_state(db: AsyncSession, user_id: UUID, persist: bool = True) -> UserStreak:
+    """Load the state, computing it on first use.
+
+    With persist=False (read-only sessions, e.g. on a replica) a missing
+    state is computed but not stored; the next write on the primary stores it.
+    """
+    state = await db.get(UserStreak, user_id)
+    if state is None:
+        if not persist:
+            return UserStreak(user_id=user_id, **await _latest_run(db, user_id))
+        state = await recompute_streak(db, user_id)
+        await db.commit()
+    return state
+
+
+async def update_streak(
+    db: AsyncSession,
+    user_id: UUID,
+    added: Optional[date] = None,
+    removed: Optional[date] = None
+) -> None:
+    """Record that a workout day was added and/or removed for the user"""
+    state = await db.scalar(
+        select(UserStreak).where(UserStreak.user_id == user_id).with_for_update()
+    )
+    if state is None or not _advance(state, added, removed):
+        if state is not None:
+            db.expunge(state)
+        await recompute_streak(db, user_id)
@@ -0,0 +1,167 @@
+"""Workout, exercise and volume totals per day, week or month.
+
+One statement aggregates both sources by date_trunc bucket: workouts, so
+that workouts without exercises still count, and the daily_stats rollup for
+exercise counts and volume. Empty buckets are filled in here, so a chart
+gets one point per bucket.
+
+Results are cached per process, keyed by the user's data version, so a
+cached series is used until the user's next write and never after it.
+"""
+from datetime import date, timedelta
+from typing import Dict, List, Literal
+from uuid import UUID
+
+from sqlalchemy import Date, DateTime, cast, func, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.metrics import register_cache
+from app.models.stats import DailyStats
+from app.models.workout import Workout
+
+Bucket = Literal["day", "week", "month"]
+
+# Longest series one request may ask for, e.g. ten years of months or weeks
+MAX_BUCKETS = 1000
+
+timeseries_cache = TTLCache(
+    maxsize=lambda: settings.TIMESERIES_CACHE_SIZE, ttl=lambda: settings.TIMESERIES_CACHE_TTL_SECONDS
+)
+register_cache("timeseries", timeseries_cache)
+
+
+def bucket_start(day: date, bucket: Bucket) -> date:
+    """Start of the bucket containing day; weeks start on Monday, as date_trunc's do"""
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(start: date, bucket: Bucket) -> date:
+    if bucket == "week":
+        return start + timedelta(days=7)
+    if bucket == "month":
+        return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return start + timedelta(days=1)
+
+
+def bucket_starts(start: date, end: date, bucket: Bucket) -> List[date]:
+    starts = []
+    current = bucket_start(start, bucket)
+    while current <= end:
+        starts.append(current)
+        current = next_bucket(current, bucket)
+    return starts
+
+
+def bucket_count(start: date, end: date, bucket: Bucket) -> int:
+    start = bucket_start(start, bucket)
+    if bucket == "month":
+        return (end.year - start.year) * 12 + end.month - start.month + 1
+    return (end - start).days // (7 if bucket == "week" else 1) + 1
+
+
+def _truncated(column, bucket: Bucket):
+    # The unit is rendered inline so SELECT and GROUP BY use the same expression
+    return cast(func.date_trunc(literal(bucket, literal_execute=True), cast(column, DateTime)), Date)
+
+
+async def _query(
+    db: AsyncSession, user_id: UUID, bucket: Bucket, start: date, end: date, by_muscle_group: bool
+):
+    workouts = select(
+        _truncated(Workout.date, bucket).label("bucket"),
+        func.count().label("workout_count"),
+    ).where(
+        Workout.user_id == user_id, Workout.date >= start, Workout.date <= end
+    ).group_by("bucket").cte("workouts_by_bucket")
+
+    group_columns = [_truncated(DailyStats.date, bucket).label("bucket")]
+    if by_muscle_group:
+        group_columns.append(DailyStats.muscle_group)
+    rollup = select(
+        *group_columns,
+        func.sum(DailyStats.exercise_count).label("exercise_count"),
+        func.sum(DailyStats.volume).label("volume"),
+        # One workout per day, so days with the group trained are its workouts
+        func.count().filter(DailyStats.exercise_count > 0).label("days"),
+    ).where(
+        DailyStats.user_id == user_id, DailyStats.date >= start, DailyStats.date <= end
+    ).group_by(*(column.name for column in group_columns)).cte("rollup_by_bucket")
+
+    columns = [
+        func.coalesce(workouts.c.bucket, rollup.c.bucket).label("bucket"),
+        func.coalesce(workouts.c.workout_count, 0).label("workout_count"),
+        func.coalesce(rollup.c.exercise_count, 0).label("exercise_count"),
+        func.coalesce(rollup.c.volume, 0).label("volume"),
+    ]
+    if by_muscle_group:
+        columns += [rollup.c.muscle_group, rollup.c.days]
+    return (await db.execute(
+        select(*columns).select_from(
+            workouts.join(rollup, workouts.c.bucket == rollup.c.bucket, full=True)
+        )
+    )).all()
+
+
+async def get_timeseries(
+    db: AsyncSession,
+    user_id: UUID,
+    version: int,
+    bucket: Bucket,
+    start: date,
+    end: date,
+    by_muscle_group: bool = False,
+) -> Dict:
+    """Totals per bucket from the start of start's bucket through end.
+
+    version is the user's current data version (see conditional_get); it
+    keys the cache, so a write invalidates every cached series of the user.
+    """
+    start = bucket_start(start, bucket)
+    key = (user_id, version, bucket, start, end, by_muscle_group)
+    cached = timeseries_cache.get(key)
+    if cached is not None:
+        return cached
+
+    points = {
+        day: {"start": day, "workout_count": 0, "exercise_count": 0, "volume": 0}
+        for day in bucket_starts(start, end, bucket)
+    }
+    if by_muscle_group:
+        for point in points.values():
+            point["muscle_groups"] = []
+
+    for row in await _query(db, user_id, bucket, start, end, by_muscle_group):
+        point = points[row.bucket]
+        if not by_muscle_group:
+            point.update(workout_count=row.workout_count, exercise_count=row.exercise_count, volume=row.volume)
+            continue
+        # Rows repeat the bucket's workout count once per muscle group
+        point["workout_count"] = row.workout_count
+        if row.muscle_group is not None:
+            point["exercise_count"] += row.exercise_count
+            point["volume"] += row.volume
+            point["muscle_groups"].append({
+                "muscle_group": row.muscle_group.value,
+                "workout_count": row.days,
+                "exercise_count": row.exercise_count,
+                "volume": row.volume,
+            })
+
+    result = {
+        "bucket": bucket,
+        "start_date": start,
+        "end_date": end,
+        "points": list(points.values()),
+    }
+    if by_muscle_group:
+        for point in result["points"]:
+            point["muscle_groups"].sort(key=lambda group: group["muscle_group"])
+    timeseries_cache.set(key, result)
+    return result
+
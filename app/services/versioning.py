@@ -0,0 +1,53 @@
+"""Per-user data versions used for ETags and version-keyed caches.
+
+Every transaction that writes a user's workouts or exercises bumps the
+user's version before writing, and stamps the rows it writes with the new
+version (see app.services.sync). Because the bump is an UPDATE of one row
+it also serializes concurrent writers for the same user, so versions are
+strictly increasing in commit order.
+"""
+import hashlib
+from datetime import date
+from uuid import UUID
+
+from fastapi import Request
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.user import UserDataVersion
+
+
+async def bump_data_version(db: AsyncSession, user_id: UUID) -> int:
+    stmt = insert(UserDataVersion).values(user_id=user_id, version=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserDataVersion.user_id],
+        set_={"version": UserDataVersion.version + 1},
+    ).returning(UserDataVersion.version)
+    return (await db.execute(stmt)).scalar_one()
+
+
+async def get_data_version(db: AsyncSession, user_id: UUID) -> int:
+    version = await db.scalar(
+        select(UserDataVersion.version).where(UserDataVersion.user_id == user_id)
+    )
+    return version or 0
+
+
+def make_etag(user_id: UUID, version: int, request: Request) -> str:
+    """Weak ETag for a user's view of one URL at one data version.
+
+    Today's date is mixed in because several responses (current week,
+    streaks, rolling windows) change at midnight without any write.
+    """
+    key = f"{user_id}|{version}|{request.url.path}?{request.url.query}|{date.today().isoformat()}"
+    digest = hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+    return f'W/"{version}-{digest}"'
+
+
+def etag_matches(etag: str, if_none_match: str) -> bool:
+    """Weak comparison of an ETag against an If-None-Match header"""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
@@ -0,0 +1,92 @@
+"""Which days of a range have a workout, packed for calendar heatmaps.
+
+Workout days come from one SELECT of dates on ix_workouts_user_id_date,
+which Postgres answers from the index alone. They are returned as a bitmap
+of one bit per day, so a year fits in 46 bytes (64 base64 characters).
+Volume levels, when asked for, are summed per day from the daily_stats
+rollup.
+
+Results are cached per process, keyed by the user's data version, as the
+timeseries are.
+"""
+import base64
+from bisect import bisect_left
+from datetime import date
+from typing import Dict, List
+from uuid import UUID
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.metrics import register_cache
+from app.models.stats import DailyStats
+from app.models.workout import Workout
+
+# Longest range one request may ask for
+MAX_DAYS = 1000
+
+calendar_cache = TTLCache(
+    maxsize=lambda: settings.CALENDAR_CACHE_SIZE, ttl=lambda: settings.CALENDAR_CACHE_TTL_SECONDS
+)
+register_cache("calendar", calendar_cache)
+
+
+def encode_days(start: date, end: date, days: List[date]) -> str:
+    """Base64 of a bitmap with bit i set if start + i days is in days.
+
+    Bit i is bit i % 8 (least significant first) of byte i // 8.
+    """
+    bits = bytearray(((end - start).days + 8) // 8)
+    for day in days:
+        offset = (day - start).days
+        bits[offset >> 3] |= 1 << (offset & 7)
+    return base64.b64encode(bits).decode()
+
+
+def volume_thresholds(volumes: List[int]) -> List[int]:
+    """The 25th, 50th and 75th percentile of the workout days' volumes"""
+    ordered = sorted(volumes)
+    return [ordered[len(ordered) * quarter // 4] for quarter in (1, 2, 3)] if ordered else []
+
+
+async def get_calendar(
+    db: AsyncSession, user_id: UUID, version: int, start: date, end: date, with_levels: bool = False
+) -> Dict:
+    """Workout days from start through end, optionally with a volume level per day.
+
+    version is the user's current data version (see conditional_get); it
+    keys the cache, so a write invalidates every cached calendar of the user.
+    """
+    key = (user_id, version, start, end, with_levels)
+    cached = calendar_cache.get(key)
+    if cached is not None:
+        return cached
+
+    days = list(await db.scalars(
+        select(Workout.date).where(Workout.user_id == user_id, Workout.date >= start, Workout.date <= end)
+    ))
+    result = {
+        "start_date": start,
+        "end_date": end,
+        "workout_count": len(days),
+        "days": encode_days(start, end, days),
+    }
+
+    if with_levels:
+        volumes = dict((await db.execute(
+            select(DailyStats.date, func.sum(DailyStats.volume)).where(
+                DailyStats.user_id == user_id, DailyStats.date >= start, DailyStats.date <= end
+            ).group_by(DailyStats.date)
+        )).all())
+        thresholds = volume_thresholds([volumes.get(day, 0) for day in days])
+        levels = bytearray(b"0" * ((end - start).days + 1))
+        for day in days:
+            # 1 to 4: one more than the number of thresholds below the day's volume
+            levels[(day - start).days] = ord("1") + bisect_left(thresholds, volumes.get(day, 0))
+        result["levels"] = levels.decode()
+        result["level_thresholds"] = thresholds
+
+    calendar_cache.set(key, result)
+    return result
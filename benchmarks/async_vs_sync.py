@@ -0,0 +1,114 @@
+"""Compare requests/sec of the sync and async database paths.
+
+Both endpoints run the same "list a user's workouts" query; one is a plain
+``def`` handler on a blocking ``Session`` (served from the threadpool), the
+other an ``async def`` handler on an ``AsyncSession``. Requests are driven
+in-process through httpx's ASGI transport at a fixed concurrency.
+
+    python -m benchmarks.async_vs_sync --concurrency 100 --requests 2000
+
+``--db-latency-ms`` adds a ``pg_sleep`` to every query to mimic a remote
+database, which is where the threadpool runs out first.
+"""
+import argparse
+import asyncio
+import time
+from uuid import UUID
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import settings
+from app.db.database import _async_database_url
+from app.models.workout import Workout
+
+
+def build_app(pool_size: int, db_latency_ms: int) -> FastAPI:
+    sync_engine = create_engine(settings.DATABASE_URL, pool_size=pool_size, max_overflow=0)
+    async_engine = create_async_engine(
+        settings.ASYNC_DATABASE_URL or _async_database_url(settings.DATABASE_URL),
+        pool_size=pool_size,
+        max_overflow=0,
+    )
+    SyncSession = sessionmaker(bind=sync_engine)
+    AsyncSessionMaker = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+    sleep = text("SELECT pg_sleep(:s)").bindparams(s=db_latency_ms / 1000)
+
+    def get_sync_db():
+        db = SyncSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def get_async_db():
+        async with AsyncSessionMaker() as db:
+            yield db
+
+    app = FastAPI()
+
+    @app.get("/sync/{user_id}")
+    def sync_workouts(user_id: UUID, db: Session = Depends(get_sync_db)):
+        if db_latency_ms:
+            db.execute(sleep)
+        rows = db.execute(select(Workout.id, Workout.date).where(Workout.user_id == user_id)).all()
+        return {"count": len(rows)}
+
+    @app.get("/async/{user_id}")
+    async def async_workouts(user_id: UUID, db: AsyncSession = Depends(get_async_db)):
+        if db_latency_ms:
+            await db.execute(sleep)
+        rows = (await db.execute(select(Workout.id, Workout.date).where(Workout.user_id == user_id))).all()
+        return {"count": len(rows)}
+
+    app.state.engines = (sync_engine, async_engine)
+    return app
+
+
+async def drive(client: httpx.AsyncClient, path: str, total: int, concurrency: int) -> float:
+    remaining = iter(range(total))
+
+    async def worker():
+        for _ in remaining:
+            response = await client.get(path)
+            response.raise_for_status()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return total / (time.perf_counter() - started)
+
+
+async def main(args: argparse.Namespace) -> None:
+    app = build_app(args.pool_size, args.db_latency_ms)
+    sync_engine, async_engine = app.state.engines
+
+    user_id = args.user_id
+    if user_id is None:
+        with sync_engine.connect() as conn:
+            user_id = conn.execute(text("SELECT user_id FROM workouts LIMIT 1")).scalar()
+        if user_id is None:
+            raise SystemExit("No workouts found; pass --user-id or load data first")
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for mode in ("sync", "async"):
+            path = f"/{mode}/{user_id}"
+            await drive(client, path, args.concurrency, args.concurrency)  # warm the pool
+            rps = await drive(client, path, args.requests, args.concurrency)
+            print(f"{mode:>5}: {rps:8.1f} req/s  (concurrency={args.concurrency}, requests={args.requests})")
+
+    sync_engine.dispose()
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user-id", type=UUID, default=None)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--pool-size", type=int, default=20)
+    parser.add_argument("--db-latency-ms", type=int, default=0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,127 @@
+"""Bytes on the wire and CPU cost of response compression.
+
+Requests GET /api/workouts at several page sizes as a generated user, once
+per available encoding and once with Accept-Encoding: identity. For each
+one it prints the bytes sent, the ratio to the identity body, the CPU time
+the encoder spends on the body, and the mean request time in process (so
+without any network time saved). Every compressed body is decoded and must
+match the identity body; the script exits 1 otherwise.
+
+Settings come from the environment as for the server, e.g.
+COMPRESSION_GZIP_LEVEL=9 or COMPRESSION_ENCODINGS=gzip. br and zstd are
+measured only if brotli and zstandard are installed.
+
+    python -m benchmarks.compression --limits 10 50 200 --requests 50
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import httpx
+
+from app.core.compression import brotli, configured_encoders, zstandard
+from app.core.config import settings
+from app.db.database import async_engine
+from app.main import app
+from benchmarks.datagen import username
+from benchmarks.startup import token_for
+
+DECODERS = {"gzip": gzip.decompress}
+if brotli is not None:
+    DECODERS["br"] = brotli.decompress
+if zstandard is not None:
+    DECODERS["zstd"] = lambda body: zstandard.ZstdDecompressor().decompress(body)
+
+
+async def fetch(client: httpx.AsyncClient, path: str, encoding: str) -> httpx.Response:
+    # Streamed so httpx hands back the bytes as sent, without decoding them
+    async with client.stream("GET", path, headers={"Accept-Encoding": encoding}) as response:
+        response.raise_for_status()
+        response.raw_body = b"".join([chunk async for chunk in response.aiter_raw()])
+    return response
+
+
+async def measure(client: httpx.AsyncClient, path: str, requests: int) -> List[Dict]:
+    identity = (await fetch(client, path, "identity")).raw_body
+    rows = []
+    for encoding, encoder in [("identity", None), *configured_encoders().items()]:
+        response = await fetch(client, path, encoding)
+        sent = response.headers.get("content-encoding", "identity")
+        body = response.raw_body
+        if sent != "identity" and DECODERS[sent](body) != identity or sent == "identity" and body != identity:
+            raise ValueError(f"{path} with {encoding}: decoded body differs from the identity body")
+
+        cpu_ms = 0.0
+        if encoder is not None and sent != "identity":
+            started = time.process_time()
+            for _ in range(requests):
+                encoder(identity)
+            cpu_ms = (time.process_time() - started) / requests * 1000
+
+        started = time.perf_counter()
+        for _ in range(requests):
+            await fetch(client, path, encoding)
+        request_ms = (time.perf_counter() - started) / requests * 1000
+        rows.append({
+            "path": path,
+            "encoding": sent,
+            "bytes": len(body),
+            "ratio": round(len(body) / len(identity), 3),
+            "compress_cpu_ms": round(cpu_ms, 3),
+            "request_ms": round(request_ms, 3),
+        })
+    return rows
+
+
+async def main(args: argparse.Namespace) -> int:
+    token = await token_for(args.user)
+    results = {
+        "recorded_at": datetime.now().isoformat(timespec="seconds"),
+        "settings": {
+            name: getattr(settings, name) for name in (
+                "COMPRESSION_ENCODINGS", "COMPRESSION_MIN_SIZE", "COMPRESSION_GZIP_LEVEL",
+                "COMPRESSION_BROTLI_QUALITY", "COMPRESSION_ZSTD_LEVEL",
+            )
+        },
+        "rows": [],
+    }
+    headers = {"Authorization": f"Bearer {token}"}
+    try:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://bench", headers=headers
+        ) as client:
+            for limit in args.limits:
+                path = f"/api/workouts?limit={limit}"
+                try:
+                    rows = await measure(client, path, args.requests)
+                except ValueError as exc:
+                    print(exc)
+                    return 1
+                results["rows"].extend(rows)
+                for row in rows:
+                    print(
+                        f"{path:<26} {row['encoding']:<9} {row['bytes']:>9} bytes  {row['ratio']:6.1%}"
+                        f"  compress {row['compress_cpu_ms']:7.3f} ms CPU  request {row['request_ms']:8.3f} ms"
+                    )
+    finally:
+        await async_engine.dispose()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user", default=username(0), help="generated user to run as")
+    parser.add_argument("--limits", type=int, nargs="+", default=[1, 10, 50, 200], help="workouts per page")
+    parser.add_argument("--requests", type=int, default=50, help="timed requests per page size and encoding")
+    parser.add_argument("--output", help="JSON results file")
+    sys.exit(asyncio.run(main(parser.parse_args())))
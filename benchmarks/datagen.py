@@ -0,0 +1,188 @@
+"""Synthetic workout history for benchmarks.
+
+Creates users named ``bench-00000``, ``bench-00001``, ... (password
+``benchmark``) with a few years of workouts. Training days, exercise
+choices and weight progression come from a seeded RNG, so the same
+arguments (including --end-date) always give the same data. Rows are
+written with Core executemany. The daily_stats rollup, personal records
+and streak state are then rebuilt for the new users.
+
+    python -m benchmarks.datagen --users 20 --years 3 --days-per-week 4 --exercises 5
+    python -m benchmarks.datagen --reset      # delete the bench-* users and their data
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Sequence
+from uuid import UUID
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.security import get_password_hash
+from app.db.database import AsyncSessionLocal, async_engine
+from app.models.exercise import Exercise, MuscleGroup
+from app.models.user import User
+from app.models.workout import Workout
+from app.services.records import rebuild_records
+from app.services.rollup import rebuild_rollup
+from app.services.streak import recompute_streak
+from app.services.versioning import bump_data_version
+
+USERNAME_PREFIX = "bench-"
+PASSWORD = "benchmark"
+# Rows per executemany call
+CHUNK_SIZE = 5000
+
+CATALOGUE = {
+    MuscleGroup.CHEST: ["Bench Press", "Incline Dumbbell Press", "Chest Fly", "Push Up"],
+    MuscleGroup.BACK: ["Deadlift", "Barbell Row", "Pull Up", "Lat Pulldown"],
+    MuscleGroup.LEGS: ["Squat", "Leg Press", "Romanian Deadlift", "Lunge"],
+    MuscleGroup.SHOULDERS: ["Overhead Press", "Lateral Raise", "Face Pull"],
+    MuscleGroup.ARMS: ["Barbell Curl", "Hammer Curl", "Tricep Pushdown", "Dip"],
+    MuscleGroup.CORE: ["Plank", "Hanging Leg Raise", "Cable Crunch"],
+    MuscleGroup.CARDIO: ["Running", "Rowing", "Cycling"],
+}
+BODYWEIGHT = {"Push Up", "Pull Up", "Dip", "Plank", "Hanging Leg Raise", "Running", "Rowing", "Cycling"}
+
+
+def _uuid(rng: random.Random) -> UUID:
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+def username(index: int) -> str:
+    return f"{USERNAME_PREFIX}{index:05d}"
+
+
+def generate_history(
+    rng: random.Random, user_id: UUID, start: date, end: date, days_per_week: float, exercises: int
+):
+    """Yield (workout row, exercise rows) for one user between start and end"""
+    # Each user has a working weight per exercise that creeps up over time
+    weights = {name: rng.randint(20, 100) for names in CATALOGUE.values() for name in names}
+    groups = list(CATALOGUE)
+    day = start
+    while day <= end:
+        if rng.random() < days_per_week / 7:
+            workout_id = _uuid(rng)
+            created_at = datetime.combine(day, datetime.min.time()) + timedelta(hours=rng.randint(6, 21))
+            workout = {
+                "id": workout_id,
+                "user_id": user_id,
+                "date": day,
+                "notes": rng.choice([None, None, "Felt strong", "Short session", "Deload"]),
+                "created_at": created_at,
+                "updated_at": created_at,
+            }
+            # A session trains two or three muscle groups
+            groups_today = rng.sample(groups, k=rng.choice([2, 3]))
+            names = [(group, name) for group in groups_today for name in CATALOGUE[group]]
+            rows = []
+            for group, name in rng.sample(names, k=min(exercises, len(names))):
+                if name not in BODYWEIGHT:
+                    weights[name] += rng.choice([0, 0, 0, 1, 2, -1])
+                rows.append({
+                    "id": _uuid(rng),
+                    "workout_id": workout_id,
+                    "name": name,
+                    "muscle_group": group,
+                    "sets": rng.randint(2, 5),
+                    "reps": rng.randint(5, 15),
+                    "weight": None if name in BODYWEIGHT else max(weights[name], 5),
+                    "notes": None,
+                    "created_at": created_at + timedelta(minutes=len(rows) * 5),
+                })
+            yield workout, rows
+        day += timedelta(days=1)
+
+
+async def _insert_chunked(db: AsyncSession, table, rows: List[Dict]) -> None:
+    for offset in range(0, len(rows), CHUNK_SIZE):
+        await db.execute(insert(table), rows[offset:offset + CHUNK_SIZE])
+
+
+async def delete_users(db: AsyncSession, user_ids: Sequence[UUID]) -> None:
+    """Delete users with their workouts and exercises (derived tables cascade)"""
+    if not user_ids:
+        return
+    workouts = select(Workout.id).where(Workout.user_id.in_(user_ids))
+    await db.execute(delete(Exercise).where(Exercise.workout_id.in_(workouts)))
+    await db.execute(delete(Workout).where(Workout.user_id.in_(user_ids)))
+    await db.execute(delete(User).where(User.id.in_(user_ids)))
+
+
+async def reset(db: AsyncSession) -> int:
+    user_ids = (await db.scalars(select(User.id).where(User.username.startswith(USERNAME_PREFIX)))).all()
+    await delete_users(db, user_ids)
+    await db.commit()
+    return len(user_ids)
+
+
+async def generate(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    end = args.end_date or date.today()
+    start = end - timedelta(days=round(365 * args.years))
+    hashed_password = get_password_hash(PASSWORD)
+
+    async with AsyncSessionLocal() as db:
+        existing = set((await db.scalars(
+            select(User.username).where(User.username.startswith(USERNAME_PREFIX))
+        )).all())
+        for index in range(args.users):
+            started = time.perf_counter()
+            user_rng = random.Random(rng.getrandbits(64))
+            if username(index) in existing:
+                print(f"{username(index)}: exists, skipped")
+                continue
+
+            user_id = _uuid(user_rng)
+            await db.execute(insert(User.__table__), [{
+                "id": user_id,
+                "email": f"{username(index)}@example.com",
+                "username": username(index),
+                "hashed_password": hashed_password,
+                "full_name": f"Benchmark User {index}",
+            }])
+            workouts, exercises = [], []
+            for workout, rows in generate_history(
+                user_rng, user_id, start, end, args.days_per_week, args.exercises
+            ):
+                workouts.append(workout)
+                exercises.extend(rows)
+            await _insert_chunked(db, Workout.__table__, workouts)
+            await _insert_chunked(db, Exercise.__table__, exercises)
+            await rebuild_rollup(db, user_id)
+            await rebuild_records(db, user_id)
+            await recompute_streak(db, user_id)
+            await bump_data_version(db, user_id)
+            await db.commit()
+            print(
+                f"{username(index)}: {len(workouts)} workouts, {len(exercises)} exercises "
+                f"in {time.perf_counter() - started:.1f}s"
+            )
+
+
+async def main(args: argparse.Namespace) -> None:
+    try:
+        if args.reset:
+            async with AsyncSessionLocal() as db:
+                print(f"Deleted {await reset(db)} benchmark users")
+        else:
+            await generate(args)
+    finally:
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--years", type=float, default=3)
+    parser.add_argument("--days-per-week", type=float, default=4)
+    parser.add_argument("--exercises", type=int, default=5, help="exercises per workout")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--end-date", type=date.fromisoformat, default=None, help="last day of history (today)")
+    parser.add_argument("--reset", action="store_true", help="delete the generated users instead")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,157 @@
+"""Check that every query the routers run can be answered from an index.
+
+Drives a scratch user through the API in-process (register, workouts,
+exercises, batch, import/export, stats, deletes), records each SELECT
+(including WITH queries), UPDATE and DELETE sent to the database and
+replays it under ``EXPLAIN (FORMAT JSON)`` with ``enable_seqscan`` off. Sequential scans are
+only chosen then when no index applies, so any ``Seq Scan`` node means a
+missing index. Exits 1 if one is found.
+
+    python -m benchmarks.explain_queries
+
+Run it after ``alembic upgrade head``; the scratch user and its rows are
+deleted afterwards.
+"""
+import asyncio
+import json
+import sys
+import uuid
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Tuple
+
+import httpx
+from sqlalchemy import event, select
+
+from app.db.database import AsyncSessionLocal, async_engine
+from app.main import app
+from app.models.user import User
+from benchmarks.datagen import delete_users
+
+EXPLAINED = ("SELECT", "WITH", "UPDATE", "DELETE")
+
+
+def seq_scans(plan: Dict) -> Iterator[str]:
+    if plan["Node Type"] == "Seq Scan":
+        yield plan["Relation Name"]
+    for child in plan.get("Plans", []):
+        yield from seq_scans(child)
+
+
+async def exercise_api(client: httpx.AsyncClient, name: str) -> None:
+    response = await client.post("/api/auth/register", json={
+        "email": f"{name}@example.com", "username": name, "password": "explain-queries"
+    })
+    response.raise_for_status()
+    response = await client.post("/api/auth/login", data={
+        "username": f"{name}@example.com", "password": "explain-queries"
+    })
+    response.raise_for_status()
+    client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+    await client.get("/api/auth/me")
+
+    today = date.today()
+    workout_ids = []
+    for days_ago in range(4):
+        response = await client.post("/api/workouts", json={
+            "date": (today - timedelta(days=days_ago)).isoformat(),
+            "exercises": [
+                {"name": "Bench Press", "muscle_group": "Chest", "sets": 3, "reps": 10, "weight": 60},
+                {"name": "Squat", "muscle_group": "Legs", "sets": 5, "reps": 5, "weight": 100},
+            ],
+        })
+        response.raise_for_status()
+        workout_ids.append(response.json()["id"])
+    workout_id = workout_ids[0]
+
+    page = (await client.get("/api/workouts", params={"limit": 2})).json()
+    await client.get("/api/workouts", params={"limit": 2, "cursor": page["next_cursor"]})
+    await client.get("/api/workouts/week")
+    await client.get("/api/workouts/calendar", params={"levels": True})
+    await client.get(f"/api/workouts/date/{today}")
+    await client.get(f"/api/workouts/{workout_id}")
+    await client.put(f"/api/workouts/{workout_ids[3]}", json={"date": (today - timedelta(days=10)).isoformat()})
+
+    await client.post("/api/workouts/import?format=ndjson", content=json.dumps({
+        "date": (today - timedelta(days=20)).isoformat(),
+        "exercises": [{"name": "Row", "muscle_group": "Back", "sets": 3, "reps": 10}],
+    }) + "\n")
+    await client.get("/api/workouts/export", params={"format": "ndjson"})
+
+    await client.get(f"/api/workouts/{workout_id}/exercises")
+    response = await client.post(f"/api/workouts/{workout_id}/exercises", json={
+        "name": "Curl", "muscle_group": "Arms", "sets": 3, "reps": 12
+    })
+    exercise_id = response.json()["id"]
+    await client.get(f"/api/workouts/{workout_id}/exercises/{exercise_id}")
+    await client.put(f"/api/workouts/{workout_id}/exercises/{exercise_id}", json={"reps": 8})
+    await client.post(f"/api/workouts/{workout_id}/exercises/batch", json={
+        "create": [{"name": "Dip", "muscle_group": "Arms", "sets": 3, "reps": 8}],
+        "update": [{"id": exercise_id, "reps": 10}],
+        "delete": [],
+    })
+    await client.delete(f"/api/workouts/{workout_id}/exercises/{exercise_id}")
+
+    for path in ("summary", "weekly", "muscle-groups", "streak", "records", "timeseries", "timeseries?by_muscle_group=true"):
+        await client.get(f"/api/stats/{path}")
+    await client.get("/api/exercises/autocomplete", params={"q": "cu"})
+    await client.get("/api/sync")
+    await client.get("/api/sync", params={"since": "1"})
+    await client.delete(f"/api/workouts/{workout_ids[1]}")
+
+
+async def cleanup(username: str) -> None:
+    async with AsyncSessionLocal() as db:
+        await delete_users(db, (await db.scalars(select(User.id).where(User.username == username))).all())
+        await db.commit()
+
+
+async def explain(statements: List[Tuple[str, tuple]]) -> int:
+    failures = 0
+    seen = set()
+    async with async_engine.connect() as conn:
+        for statement, parameters in statements:
+            if statement in seen:
+                continue
+            seen.add(statement)
+            async with conn.begin() as transaction:
+                await conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+                plan = (await conn.exec_driver_sql(
+                    f"EXPLAIN (FORMAT JSON) {statement}", parameters
+                )).scalar()[0]["Plan"]
+                await transaction.rollback()
+            tables = sorted(set(seq_scans(plan)))
+            first_line = " ".join(statement.split())[:110]
+            if tables:
+                failures += 1
+                print(f"SEQ SCAN on {', '.join(tables)}: {first_line}")
+            else:
+                print(f"ok: {first_line}")
+    print(f"{len(seen)} distinct statements, {failures} without an index")
+    return failures
+
+
+async def main() -> int:
+    statements: List[Tuple[str, tuple]] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(EXPLAINED):
+            statements.append((statement, tuple(parameters or ())))
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    username = f"explain-{uuid.uuid4().hex[:8]}"
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://explain")
+    try:
+        async with client:
+            await exercise_api(client, username)
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+        await cleanup(username)
+
+    try:
+        return 1 if await explain(statements) else 0
+    finally:
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
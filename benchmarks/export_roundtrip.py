@@ -0,0 +1,162 @@
+"""Check that both export formats import back unchanged.
+
+Imports a fixture history into a scratch user: notes spanning lines (\\n
+and \\r\\n), with quotes, commas, non-ASCII text and control characters,
+plus a workout without exercises. It exports it as NDJSON and as CSV, imports
+each export into a fresh user, and compares what that user gets back with the
+fixture: dates, workout notes and each workout's exercises in order. CSV has
+no null, so an empty note comes back as null from the CSV round trip.
+Exits 1 if an import reports errors or any workout differs.
+
+    python -m benchmarks.export_roundtrip --workouts 300
+"""
+import argparse
+import asyncio
+import json
+import sys
+import uuid
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+import httpx
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal, async_engine
+from app.main import app
+from app.models.exercise import MuscleGroup
+from app.models.user import User
+from benchmarks.datagen import delete_users
+
+NOTES = [
+    None,
+    "",
+    "plain",
+    "first line\nsecond line",
+    "windows\r\nline endings\r\n",
+    'comma, "quoted", and ""doubled""',
+    '"\nstarts with a quote and a newline',
+    '5" plates, ends with a quote"',
+    "Ünïcode ✓ 💪 日本語\n\n\tindented",
+    "control \x01\x1f and separators \u2028 \u2029",
+]
+GROUPS = [group.value for group in MuscleGroup]
+EXERCISE_FIELDS = ("name", "muscle_group", "sets", "reps", "weight", "notes")
+
+
+def fixture(workouts: int) -> List[Dict]:
+    start = date(2020, 1, 1)
+    return [
+        {
+            "date": (start + timedelta(days=i)).isoformat(),
+            "notes": NOTES[i % len(NOTES)],
+            "exercises": [
+                {
+                    "name": f"Exercise {j}",
+                    "muscle_group": GROUPS[(i + j) % len(GROUPS)],
+                    "sets": 1 + j,
+                    "reps": 5 + i % 7,
+                    "weight": None if (i + j) % 4 == 0 else 10 + j,
+                    "notes": NOTES[(i + j) % len(NOTES)],
+                }
+                for j in range(i % 4)
+            ],
+        }
+        for i in range(workouts)
+    ]
+
+
+def normalised(workouts: List[Dict], empty_as_null: bool = False) -> List[Dict]:
+    def note(value: Optional[str]) -> Optional[str]:
+        return None if empty_as_null and value == "" else value
+
+    return [
+        {
+            "date": workout["date"],
+            "notes": note(workout["notes"]),
+            "exercises": [
+                {**{field: exercise[field] for field in EXERCISE_FIELDS}, "notes": note(exercise["notes"])}
+                for exercise in workout["exercises"]
+            ],
+        }
+        for workout in sorted(workouts, key=lambda workout: workout["date"])
+    ]
+
+
+async def login(client: httpx.AsyncClient, name: str) -> Dict[str, str]:
+    await client.post("/api/auth/register", json={
+        "email": f"{name}@example.com", "username": name, "password": "roundtrip"
+    })
+    response = await client.post("/api/auth/login", data={
+        "username": f"{name}@example.com", "password": "roundtrip"
+    })
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def export(client: httpx.AsyncClient, headers: Dict[str, str], format: str) -> bytes:
+    response = await client.get("/api/workouts/export", params={"format": format}, headers=headers)
+    response.raise_for_status()
+    return response.content
+
+
+async def import_(client: httpx.AsyncClient, headers: Dict[str, str], format: str, body: bytes) -> Dict:
+    response = await client.post("/api/workouts/import", params={"format": format}, headers=headers, content=body)
+    response.raise_for_status()
+    result = response.json()
+    for error in result["errors"][:3]:
+        print(f"  {format} import, line {error['line']}: {error['error']}")
+    return result
+
+
+async def run(client: httpx.AsyncClient, args: argparse.Namespace, names: List[str]) -> int:
+    workouts = fixture(args.workouts)
+    source = await login(client, names[0])
+    await import_(client, source, "ndjson", "".join(json.dumps(w) + "\n" for w in workouts).encode())
+
+    failures = 0
+    for format, name in zip(("ndjson", "csv"), names[1:]):
+        target = await login(client, name)
+        result = await import_(client, target, format, await export(client, source, format))
+        back = [json.loads(line) for line in (await export(client, target, "ndjson")).splitlines()]
+        expected = normalised(workouts, empty_as_null=format == "csv")
+        actual = normalised(back)
+        different = [(e, a) for e, a in zip(expected, actual) if e != a]
+        if len(expected) != len(actual):
+            different.append((f"{len(expected)} workouts", f"{len(actual)} workouts"))
+        ok = not different and not result["error_count"]
+        failures += not ok
+        print(
+            f"{'ok' if ok else 'DIFFERENT':>9}  {format}: "
+            f"{result['workouts_imported']} workouts, {result['exercises_imported']} exercises"
+        )
+        for wanted, got in different[:3]:
+            print(f"  expected: {wanted!r}\n  got:      {got!r}")
+    return failures
+
+
+async def cleanup(names: List[str]) -> None:
+    async with AsyncSessionLocal() as db:
+        await delete_users(db, (await db.scalars(select(User.id).where(User.username.in_(names)))).all())
+        await db.commit()
+
+
+async def main(args: argparse.Namespace) -> int:
+    # Three registrations and logins in a row would run into the auth rate limit
+    for bucket in ("AUTH", "AUTH_ADDRESS", "STATS", "WRITES"):
+        setattr(settings, f"ADMISSION_{bucket}_RATE", 0)
+    run_id = uuid.uuid4().hex[:8]
+    names = [f"roundtrip-{run_id}-{role}" for role in ("source", "ndjson", "csv")]
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            failures = await run(client, args, names)
+    finally:
+        await cleanup(names)
+        await async_engine.dispose()
+    print(f"{failures} formats different after the round trip")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workouts", type=int, default=300)
+    sys.exit(asyncio.run(main(parser.parse_args())))
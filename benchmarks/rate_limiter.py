@@ -0,0 +1,91 @@
+"""Check the admission token buckets against each other.
+
+Runs the same sequence of takes through MemoryRateLimiter and through
+RedisRateLimiter, whose Lua script (TAKE_SCRIPT) runs on fakeredis unless
+--redis-url names a real server. Both must admit a full burst, reject the
+next take with the wait until a token refills, admit again after that wait,
+keep keys apart, and drop buckets once they have refilled. Two
+RedisRateLimiters on the same server must share buckets, as workers do.
+Exits 1 if any check fails.
+
+    python -m benchmarks.rate_limiter
+    python -m benchmarks.rate_limiter --redis-url redis://localhost:6379/15
+"""
+import argparse
+import asyncio
+import sys
+import uuid
+from typing import List, Optional
+
+from app.core.admission import MemoryRateLimiter, RateLimiter, RedisRateLimiter
+
+RATE = 20.0
+BURST = 5
+
+
+def check(failures: List[str], name: str, condition: bool, detail: str) -> None:
+    print(f"{'ok' if condition else 'FAILED':>8}  {name}: {detail}")
+    if not condition:
+        failures.append(name)
+
+
+async def stored(limiter: RateLimiter, key: str) -> bool:
+    if isinstance(limiter, RedisRateLimiter):
+        return bool(await limiter._client.exists(limiter._prefix + key))
+    return limiter._buckets.get(key) is not None
+
+
+async def run(name: str, limiter: RateLimiter, peer: Optional[RateLimiter], failures: List[str]) -> None:
+    key = f"check:{uuid.uuid4().hex}"
+    waits = [await limiter.take(key, RATE, BURST) for _ in range(BURST)]
+    check(failures, f"{name} burst", waits == [0.0] * BURST, f"{BURST} takes waited {waits}")
+
+    wait = await limiter.take(key, RATE, BURST)
+    check(failures, f"{name} over burst", 0 < wait <= 1 / RATE, f"next take waits {wait:.4f} s")
+    check(
+        failures, f"{name} other key", await limiter.take(key + ":other", RATE, BURST) == 0.0,
+        "another key has its own bucket",
+    )
+
+    await asyncio.sleep(wait + 0.01)
+    check(failures, f"{name} refill", await limiter.take(key, RATE, BURST) == 0.0, "admitted after the wait")
+    check(failures, f"{name} empty again", await limiter.take(key, RATE, BURST) > 0, "one token refilled, not more")
+    if peer is not None:
+        check(failures, f"{name} shared", await peer.take(key, RATE, BURST) > 0, "a second client finds it empty too")
+
+    # Buckets are kept at most a second past the time they take to refill
+    await asyncio.sleep(BURST / RATE + 1.1)
+    check(failures, f"{name} idle bucket", not await stored(limiter, key), "dropped once refilled")
+    check(failures, f"{name} after idle", await limiter.take(key, RATE, BURST) == 0.0, "starts full again")
+
+
+async def main(args: argparse.Namespace) -> int:
+    failures: List[str] = []
+    await run("memory", MemoryRateLimiter(), None, failures)
+
+    if args.redis_url:
+        def connect():
+            return RedisRateLimiter.from_url(args.redis_url)
+    else:
+        import fakeredis
+
+        server = fakeredis.FakeServer()
+
+        def connect():
+            return RedisRateLimiter(fakeredis.FakeAsyncRedis(server=server))
+
+    redis, peer = connect(), connect()
+    try:
+        await run("redis", redis, peer, failures)
+    finally:
+        await redis.close()
+        await peer.close()
+
+    print(f"{len(failures)} checks failed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis-url", help="a real redis server to use instead of fakeredis")
+    sys.exit(asyncio.run(main(parser.parse_args())))
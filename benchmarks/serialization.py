@@ -0,0 +1,137 @@
+"""Check and time the fast JSON path of the list endpoints.
+
+Imports a scratch user's history, including notes with non-ASCII text,
+quotes, control characters and U+2028. It then requests every list
+endpoint twice: once with FAST_JSON_RESPONSES on (orjson, no re-validation)
+and once with it off (response_model validation and FastAPI's
+JSONResponse). The two bodies must be byte-for-byte identical; the script
+exits 1 on the first difference and otherwise prints the mean latency of
+each mode.
+
+    python -m benchmarks.serialization --workouts 200 --exercises 6 --requests 50
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import uuid
+from datetime import date, timedelta
+
+import httpx
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal, async_engine
+from app.main import app
+from app.models.exercise import MuscleGroup
+from app.models.user import User
+from benchmarks.datagen import delete_users
+
+NOTES = [
+    None,
+    "",
+    "plain",
+    "Ünïcode ✓ 💪 日本語",
+    'quote " and \\ backslash',
+    "line\nbreak\ttab\rreturn\x01\x1f control",
+    "separators \u2028 \u2029 and </script>",
+]
+GROUPS = [group.value for group in MuscleGroup]
+
+
+def history(workouts: int, exercises: int) -> str:
+    today = date.today()
+    lines = []
+    for i in range(workouts):
+        lines.append(json.dumps({
+            "date": (today - timedelta(days=i)).isoformat(),
+            "notes": NOTES[i % len(NOTES)],
+            "exercises": [
+                {
+                    "name": f"Exercise {j} {NOTES[(i + j) % len(NOTES)] or ''}",
+                    "muscle_group": GROUPS[(i + j) % len(GROUPS)],
+                    "sets": 3 + j,
+                    "reps": 8 + i % 5,
+                    "weight": None if j % 3 == 0 else 20 + i + j,
+                    "notes": NOTES[(i * j) % len(NOTES)],
+                }
+                for j in range(exercises)
+            ],
+        }))
+    return "\n".join(lines) + "\n"
+
+
+async def timed_get(client: httpx.AsyncClient, path: str, fast: bool, requests: int):
+    settings.FAST_JSON_RESPONSES = fast
+    response = await client.get(path)
+    response.raise_for_status()
+    started = time.perf_counter()
+    for _ in range(requests):
+        await client.get(path)
+    return response, (time.perf_counter() - started) / requests * 1000
+
+
+async def run(client: httpx.AsyncClient, args: argparse.Namespace, name: str) -> int:
+    await client.post("/api/auth/register", json={
+        "email": f"{name}@example.com", "username": name, "password": "serialization"
+    })
+    response = await client.post("/api/auth/login", data={
+        "username": f"{name}@example.com", "password": "serialization"
+    })
+    client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+    await client.post("/api/workouts/import?format=ndjson", content=history(args.workouts, args.exercises))
+
+    page = (await client.get("/api/workouts", params={"limit": 2})).json()
+    workout_id = page["items"][0]["id"]
+    paths = [
+        f"/api/workouts?limit={min(args.workouts, 200)}",
+        f"/api/workouts?limit=2&cursor={page['next_cursor']}",
+        f"/api/workouts/week?start_date={date.today() - timedelta(days=6)}",
+        f"/api/workouts/{workout_id}/exercises",
+        "/api/stats/muscle-groups?days=3650",
+        "/api/stats/timeseries?bucket=day&by_muscle_group=true",
+    ]
+
+    failures = 0
+    for path in paths:
+        slow, slow_ms = await timed_get(client, path, False, args.requests)
+        fast, fast_ms = await timed_get(client, path, True, args.requests)
+        same = slow.content == fast.content and slow.headers.get("etag") == fast.headers.get("etag")
+        failures += not same
+        print(
+            f"{'ok' if same else 'DIFFERENT':>9}  {path}\n"
+            f"           {len(fast.content):>8} bytes  validated {slow_ms:7.2f} ms  fast {fast_ms:7.2f} ms"
+        )
+        if not same:
+            print(f"  validated: {slow.content[:300]!r}\n  fast:      {fast.content[:300]!r}")
+    return failures
+
+
+async def cleanup(username: str) -> None:
+    async with AsyncSessionLocal() as db:
+        await delete_users(db, (await db.scalars(select(User.id).where(User.username == username))).all())
+        await db.commit()
+
+
+async def main(args: argparse.Namespace) -> int:
+    # Timed loops of one user would run into the per-user rate limits
+    for bucket in ("AUTH", "AUTH_ADDRESS", "STATS", "WRITES"):
+        setattr(settings, f"ADMISSION_{bucket}_RATE", 0)
+    username = f"serialization-{uuid.uuid4().hex[:8]}"
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            failures = await run(client, args, username)
+    finally:
+        await cleanup(username)
+        await async_engine.dispose()
+    print(f"{failures} endpoints with different output")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workouts", type=int, default=200)
+    parser.add_argument("--exercises", type=int, default=6)
+    parser.add_argument("--requests", type=int, default=50)
+    sys.exit(asyncio.run(main(parser.parse_args())))
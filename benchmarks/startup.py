@@ -0,0 +1,136 @@
+"""Worker boot time: import cost, lifespan startup and the first requests.
+
+Each run starts a fresh interpreter, as a new worker would, and times:
+
+- ``import``: ``import app.main`` (no settings are read and no connections
+  are opened at import);
+- ``startup``: the lifespan startup (DB_POOL_WARMUP, DB_CREATE_SCHEMA);
+- ``first_request`` and ``second_request``: two authenticated
+  ``GET /api/stats/summary`` calls. Without warmup, the first one also
+  opens the connection.
+
+It also reports the wall time of the whole process, interpreter start
+included. Medians over --runs are printed and written to --output. With
+--baseline, the script exits 1 if any median got slower than --tolerance.
+
+    python -m benchmarks.datagen --users 1
+    python -m benchmarks.startup --runs 10 --warmup 0 --warmup 5
+    python -X importtime -c "import app.main" 2>&1 | sort -t'|' -k2 -n | tail   # per-module import cost
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from sqlalchemy import select
+
+from app.core.security import create_access_token
+from app.db.database import AsyncSessionLocal, async_engine
+from app.models.user import User
+from benchmarks.datagen import username
+
+PHASES = ("import", "startup", "first_request", "second_request", "process")
+
+# Runs in the child interpreter; prints one JSON line of phase timings
+CHILD = """
+import time
+started = time.perf_counter()
+import asyncio, json, os
+from app.main import app
+imported = time.perf_counter()
+
+import httpx
+
+async def boot():
+    timings = {"import": imported - started}
+    mark = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        timings["startup"] = time.perf_counter() - mark
+        headers = {"Authorization": "Bearer " + os.environ["STARTUP_BENCH_TOKEN"]}
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            for phase in ("first_request", "second_request"):
+                mark = time.perf_counter()
+                response = await client.get("/api/stats/summary", headers=headers)
+                timings[phase] = time.perf_counter() - mark
+                response.raise_for_status()
+    print(json.dumps(timings))
+
+asyncio.run(boot())
+"""
+
+
+async def token_for(name: str) -> str:
+    async with AsyncSessionLocal() as db:
+        user_id = await db.scalar(select(User.id).where(User.username == name))
+    await async_engine.dispose()
+    if user_id is None:
+        sys.exit(f"User {name} not found; run `python -m benchmarks.datagen --users 1` first")
+    return create_access_token({"sub": str(user_id)}, expires_delta=timedelta(hours=1))
+
+
+def run_once(token: str, warmup: int) -> Dict[str, float]:
+    env = dict(os.environ, STARTUP_BENCH_TOKEN=token, DB_POOL_WARMUP=str(warmup))
+    started = time.perf_counter()
+    child = subprocess.run([sys.executable, "-c", CHILD], env=env, capture_output=True, text=True)
+    if child.returncode:
+        sys.exit(child.stderr)
+    timings = json.loads(child.stdout.strip().splitlines()[-1])
+    timings["process"] = time.perf_counter() - started
+    return timings
+
+
+def medians(runs: List[Dict[str, float]]) -> Dict[str, float]:
+    return {phase: round(statistics.median(run[phase] for run in runs) * 1000, 2) for phase in PHASES}
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> int:
+    regressions = 0
+    print(f"\nCompared with {baseline.get('recorded_at', 'baseline')}, tolerance {tolerance:.0%}")
+    for key, phases in results["configurations"].items():
+        before = baseline["configurations"].get(key)
+        if before is None:
+            continue
+        for phase, ms in phases.items():
+            change = ms / before[phase] - 1 if before[phase] else 0
+            slower = change > tolerance
+            regressions += slower
+            print(f"  {key:<10} {phase:<15} {change:+7.1%}  {'REGRESSION' if slower else 'ok'}")
+    return regressions
+
+
+def main(args: argparse.Namespace) -> int:
+    token = asyncio.run(token_for(args.user))
+    results = {"recorded_at": datetime.now().isoformat(timespec="seconds"), "runs": args.runs, "configurations": {}}
+    for warmup in args.warmup or [0]:
+        runs = [run_once(token, warmup) for _ in range(args.runs)]
+        key = f"warmup={warmup}"
+        results["configurations"][key] = phases = medians(runs)
+        print(f"{key:<10} " + "  ".join(f"{phase} {phases[phase]:8.2f} ms" for phase in PHASES))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            return 1 if compare(results, json.load(f), args.tolerance) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user", default=username(0), help="generated user to run as")
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes per configuration")
+    parser.add_argument(
+        "--warmup", type=int, action="append", help="DB_POOL_WARMUP to measure; repeat for several (0)"
+    )
+    parser.add_argument("--output", help="JSON results file")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before failing")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,452 @@
+"""Latency, throughput and query-count benchmarks for every router.
+
+Runs each scenario against the app in-process, through httpx's ASGI
+transport. It uses the database configured in ``.env`` and one user
+created by ``benchmarks.datagen``. For every scenario it reports p50/p99
+latency, requests per second at the given concurrency and SQL statements
+per request. Results are written as JSON. Pass an earlier file as
+``--baseline`` to compare against it; the exit status is 1 if any
+scenario got slower than the tolerance or issues more queries.
+
+    python -m benchmarks.datagen --users 1 --years 3
+    python -m benchmarks.suite --output benchmarks/results/baseline.json
+    python -m benchmarks.suite --baseline benchmarks/results/baseline.json
+
+Write scenarios use dates before 1950 so they never touch the generated
+history. Whatever they leave behind is deleted at the end of the run.
+"""
+import argparse
+import asyncio
+import fnmatch
+import itertools
+import json
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.db.database import async_engine
+from app.main import app
+from benchmarks.datagen import PASSWORD, username
+
+# Write scenarios use dates from here on, far before any generated history
+SCRATCH_EPOCH = date(1900, 1, 1)
+SCRATCH_END = date(1949, 12, 31)
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+@dataclass
+class Context:
+    client: httpx.AsyncClient
+    username: str
+    workout_ids: List[str]
+    dates: List[str]
+    workout_id: str
+    exercise_ids: List[str]
+    cursor: str
+    # Ids created by one scenario and consumed by a later one
+    created_workouts: List[str] = field(default_factory=list)
+    created_exercises: List[str] = field(default_factory=list)
+    sync_token: Optional[str] = None
+    scratch_days: itertools.count = field(default_factory=itertools.count)
+
+    def scratch_date(self) -> str:
+        return (SCRATCH_EPOCH + timedelta(days=next(self.scratch_days))).isoformat()
+
+
+@dataclass
+class Scenario:
+    name: str
+    router: str
+    call: Callable[[Context, int], Awaitable[httpx.Response]]
+    # Share of --requests this scenario runs (slow or write-heavy ones run fewer)
+    weight: float = 1.0
+
+
+SCENARIOS: List[Scenario] = []
+
+
+def scenario(router: str, weight: float = 1.0):
+    def register(call):
+        SCENARIOS.append(Scenario(f"{router}.{call.__name__}", router, call, weight))
+        return call
+    return register
+
+
+@scenario("auth", weight=0.05)
+async def login(ctx: Context, i: int):
+    return await ctx.client.post(
+        "/api/auth/login", data={"username": f"{ctx.username}@example.com", "password": PASSWORD}
+    )
+
+
+@scenario("auth")
+async def me(ctx: Context, i: int):
+    return await ctx.client.get("/api/auth/me")
+
+
+@scenario("workouts")
+async def list_first_page(ctx: Context, i: int):
+    return await ctx.client.get("/api/workouts")
+
+
+@scenario("workouts")
+async def list_next_page(ctx: Context, i: int):
+    return await ctx.client.get("/api/workouts", params={"cursor": ctx.cursor})
+
+
+@scenario("workouts")
+async def list_full_page(ctx: Context, i: int):
+    return await ctx.client.get("/api/workouts", params={"limit": 200})
+
+
+@scenario("workouts")
+async def week(ctx: Context, i: int):
+    return await ctx.client.get("/api/workouts/week")
+
+
+@scenario("workouts")
+async def calendar(ctx: Context, i: int):
+    return await ctx.client.get("/api/workouts/calendar", params={"levels": True})
+
+
+@scenario("workouts")
+async def calendar_uncached(ctx: Context, i: int):
+    # A different range per request, so every one runs the queries
+    end_date = date.today() - timedelta(days=i)
+    return await ctx.client.get("/api/workouts/calendar", params={"levels": True, "end_date": end_date.isoformat()})
+
+
+@scenario("workouts")
+async def by_date(ctx: Context, i: int):
+    return await ctx.client.get(f"/api/workouts/date/{ctx.dates[i % len(ctx.dates)]}")
+
+
+@scenario("workouts")
+async def get(ctx: Context, i: int):
+    return await ctx.client.get(f"/api/workouts/{ctx.workout_ids[i % len(ctx.workout_ids)]}")
+
+
+@scenario("workouts", weight=0.1)
+async def export(ctx: Context, i: int):
+    return await ctx.client.get("/api/workouts/export")
+
+
+@scenario("workouts", weight=0.25)
+async def create(ctx: Context, i: int):
+    response = await ctx.client.post("/api/workouts", json={
+        "date": ctx.scratch_date(),
+        "exercises": [
+            {"name": "Bench Press", "muscle_group": "Chest", "sets": 3, "reps": 8, "weight": 80},
+            {"name": "Squat", "muscle_group": "Legs", "sets": 5, "reps": 5, "weight": 120},
+        ],
+    })
+    if response.status_code == 201:
+        ctx.created_workouts.append(response.json()["id"])
+    return response
+
+
+@scenario("workouts", weight=0.25)
+async def update(ctx: Context, i: int):
+    return await ctx.client.put(f"/api/workouts/{ctx.workout_id}", json={"notes": f"benchmark {i}"})
+
+
+@scenario("workouts", weight=0.25)
+async def delete(ctx: Context, i: int):
+    return await ctx.client.delete(f"/api/workouts/{ctx.created_workouts.pop()}")
+
+
+@scenario("workouts", weight=0.05)
+async def import_ndjson(ctx: Context, i: int):
+    body = "".join(
+        json.dumps({
+            "date": ctx.scratch_date(),
+            "exercises": [{"name": "Deadlift", "muscle_group": "Back", "sets": 3, "reps": 5, "weight": 140}],
+        }) + "\n"
+        for _ in range(20)
+    )
+    return await ctx.client.post("/api/workouts/import?format=ndjson", content=body)
+
+
+@scenario("exercises")
+async def list_exercises(ctx: Context, i: int):
+    return await ctx.client.get(f"/api/workouts/{ctx.workout_id}/exercises")
+
+
+@scenario("exercises")
+async def get_exercise(ctx: Context, i: int):
+    exercise_id = ctx.exercise_ids[i % len(ctx.exercise_ids)]
+    return await ctx.client.get(f"/api/workouts/{ctx.workout_id}/exercises/{exercise_id}")
+
+
+@scenario("exercises")
+async def autocomplete(ctx: Context, i: int):
+    # One to three letters, as typed into the picker
+    return await ctx.client.get("/api/exercises/autocomplete", params={"q": "bench press"[:i % 3 + 1]})
+
+
+@scenario("exercises", weight=0.25)
+async def create_exercise(ctx: Context, i: int):
+    response = await ctx.client.post(f"/api/workouts/{ctx.workout_id}/exercises", json={
+        "name": "Lateral Raise", "muscle_group": "Shoulders", "sets": 3, "reps": 15, "weight": 10
+    })
+    if response.status_code == 201:
+        ctx.created_exercises.append(response.json()["id"])
+    return response
+
+
+@scenario("exercises", weight=0.25)
+async def update_exercise(ctx: Context, i: int):
+    exercise_id = ctx.exercise_ids[i % len(ctx.exercise_ids)]
+    return await ctx.client.put(f"/api/workouts/{ctx.workout_id}/exercises/{exercise_id}", json={"notes": f"{i}"})
+
+
+@scenario("exercises", weight=0.25)
+async def delete_exercise(ctx: Context, i: int):
+    exercise_id = ctx.created_exercises.pop()
+    return await ctx.client.delete(f"/api/workouts/{ctx.workout_id}/exercises/{exercise_id}")
+
+
+@scenario("exercises", weight=0.25)
+async def batch(ctx: Context, i: int):
+    return await ctx.client.post(f"/api/workouts/{ctx.workout_id}/exercises/batch", json={
+        "create": [{"name": "Face Pull", "muscle_group": "Shoulders", "sets": 3, "reps": 15}],
+        "update": [{"id": exercise_id, "notes": f"{i}"} for exercise_id in ctx.exercise_ids[:2]],
+        "delete": [],
+    })
+
+
+@scenario("stats")
+async def summary(ctx: Context, i: int):
+    return await ctx.client.get("/api/stats/summary")
+
+
+@scenario("stats")
+async def weekly(ctx: Context, i: int):
+    return await ctx.client.get("/api/stats/weekly")
+
+
+@scenario("stats")
+async def muscle_groups(ctx: Context, i: int):
+    return await ctx.client.get("/api/stats/muscle-groups", params={"days": 365})
+
+
+@scenario("stats")
+async def timeseries(ctx: Context, i: int):
+    # Served from the version-keyed cache after the first request
+    return await ctx.client.get("/api/stats/timeseries", params={"bucket": "week", "by_muscle_group": True})
+
+
+@scenario("stats")
+async def timeseries_uncached(ctx: Context, i: int):
+    # A different range per request, so every one runs the query
+    end_date = date.today() - timedelta(days=i)
+    return await ctx.client.get("/api/stats/timeseries", params={
+        "bucket": "week", "by_muscle_group": True, "end_date": end_date.isoformat()
+    })
+
+
+@scenario("stats")
+async def records(ctx: Context, i: int):
+    return await ctx.client.get("/api/stats/records")
+
+
+@scenario("stats")
+async def streak(ctx: Context, i: int):
+    return await ctx.client.get("/api/stats/streak")
+
+
+@scenario("sync", weight=0.1)
+async def full(ctx: Context, i: int):
+    response = await ctx.client.get("/api/sync")
+    ctx.sync_token = response.json()["token"]
+    return response
+
+
+@scenario("sync")
+async def delta(ctx: Context, i: int):
+    if ctx.sync_token is None:
+        ctx.sync_token = (await ctx.client.get("/api/sync")).json()["token"]
+    # Up to the last ten writes, made by the write scenarios earlier in the run
+    since = max(int(ctx.sync_token) - i % 10, 0)
+    return await ctx.client.get("/api/sync", params={"since": since})
+
+
+def percentile(latencies: List[float], pct: int) -> float:
+    if len(latencies) == 1:
+        return latencies[0]
+    return statistics.quantiles(latencies, n=100, method="inclusive")[pct - 1]
+
+
+async def run_scenario(ctx: Context, scenario: Scenario, total: int, concurrency: int, queries: List[int]) -> Dict:
+    latencies: List[float] = []
+    errors = 0
+    indexes = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in indexes:
+            started = time.perf_counter()
+            response = await scenario.call(ctx, i)
+            latencies.append((time.perf_counter() - started) * 1000)
+            errors += response.status_code >= 400
+
+    queries[0] = 0
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, total))))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "router": scenario.router,
+        "requests": total,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "mean_ms": round(statistics.fmean(latencies), 3),
+        "throughput_rps": round(total / elapsed, 1),
+        "queries_per_request": round(queries[0] / total, 2),
+    }
+
+
+async def setup(client: httpx.AsyncClient, name: str) -> Context:
+    response = await client.post("/api/auth/login", data={"username": f"{name}@example.com", "password": PASSWORD})
+    if response.status_code != 200:
+        raise SystemExit(f"Cannot log in as {name}; create it with `python -m benchmarks.datagen` first")
+    client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+    page = (await client.get("/api/workouts", params={"limit": 200})).json()
+    workouts = [w for w in page["items"] if w["exercises"]]
+    if not workouts or not page["next_cursor"]:
+        raise SystemExit(f"{name} needs more than 200 workouts with exercises")
+    return Context(
+        client=client,
+        username=name,
+        workout_ids=[w["id"] for w in workouts],
+        dates=[w["date"] for w in workouts],
+        workout_id=workouts[0]["id"],
+        exercise_ids=[e["id"] for e in workouts[0]["exercises"]],
+        cursor=page["next_cursor"],
+    )
+
+
+async def cleanup(ctx: Context) -> None:
+    """Delete everything the write scenarios created, through the API"""
+    for exercise_id in ctx.created_exercises:
+        await ctx.client.delete(f"/api/workouts/{ctx.workout_id}/exercises/{exercise_id}")
+    exercises = (await ctx.client.get(f"/api/workouts/{ctx.workout_id}/exercises")).json()
+    for exercise in exercises:
+        if exercise["id"] not in ctx.exercise_ids:
+            await ctx.client.delete(f"/api/workouts/{ctx.workout_id}/exercises/{exercise['id']}")
+    while True:
+        page = (await ctx.client.get("/api/workouts", params={"end_date": SCRATCH_END, "limit": 200})).json()
+        if not page["items"]:
+            break
+        for workout in page["items"]:
+            await ctx.client.delete(f"/api/workouts/{workout['id']}")
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> int:
+    """Print each scenario against the baseline; return the number of regressions"""
+    regressions = 0
+    print(f"\nCompared with {baseline.get('git_commit')} ({baseline.get('created_at')}), tolerance {tolerance:.0%}")
+    for name, current in results["scenarios"].items():
+        previous = baseline["scenarios"].get(name)
+        if previous is None:
+            print(f"  {name:<32} new")
+            continue
+        problems = [
+            f"{metric} {previous[metric]} -> {current[metric]}"
+            for metric in ("p50_ms", "p99_ms")
+            if current[metric] > previous[metric] * (1 + tolerance)
+        ]
+        if current["queries_per_request"] > previous["queries_per_request"]:
+            problems.append(
+                f"queries/request {previous['queries_per_request']} -> {current['queries_per_request']}"
+            )
+        regressions += bool(problems)
+        change = (current["p50_ms"] - previous["p50_ms"]) / previous["p50_ms"] if previous["p50_ms"] else 0.0
+        print(f"  {name:<32} p50 {change:+7.1%}  {'REGRESSION: ' + '; '.join(problems) if problems else 'ok'}")
+    return regressions
+
+
+async def main(args: argparse.Namespace) -> int:
+    # Every request comes from one user and address, so per-client rate limits
+    # would reject most of them; the concurrency caps still apply
+    for bucket in ("AUTH", "AUTH_ADDRESS", "STATS", "WRITES"):
+        setattr(settings, f"ADMISSION_{bucket}_RATE", 0)
+    queries = [0]
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        queries[0] += 1
+
+    selected = [s for s in SCENARIOS if any(fnmatch.fnmatch(s.name, pattern) for pattern in args.only)]
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+    results = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "user": args.user,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "scenarios": {},
+    }
+    try:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None
+        ) as client:
+            ctx = await setup(client, args.user)
+            try:
+                for s in selected:
+                    total = max(2, round(args.requests * s.weight))
+                    # Warm up caches and the connection pool before measuring
+                    await run_scenario(ctx, s, min(total, args.concurrency), args.concurrency, queries)
+                    result = await run_scenario(ctx, s, total, args.concurrency, queries)
+                    results["scenarios"][s.name] = result
+                    print(
+                        f"{s.name:<32} p50 {result['p50_ms']:8.2f} ms  p99 {result['p99_ms']:8.2f} ms  "
+                        f"{result['throughput_rps']:8.1f} req/s  {result['queries_per_request']:5.1f} queries"
+                        + (f"  {result['errors']} errors" if result["errors"] else "")
+                    )
+            finally:
+                await cleanup(ctx)
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", count)
+        await async_engine.dispose()
+
+    output = Path(args.output or RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2) + "\n")
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        return 1 if compare(results, baseline, args.tolerance) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user", default=username(0), help="generated user to run as")
+    parser.add_argument("--requests", type=int, default=200, help="requests per read scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--only", nargs="+", default=["*"], help="scenario name patterns, e.g. 'stats.*'")
+    parser.add_argument("--output", default=None, help="JSON results file (benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--baseline", default=None, help="earlier results file to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p50/p99 slowdown (0.2 = 20%%)")
+    sys.exit(asyncio.run(main(parser.parse_args())))
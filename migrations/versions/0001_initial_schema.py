@@ -0,0 +1,72 @@
+"""Initial schema: users, workouts and exercises, as create_all used to build them
+
+Databases created by create_all should be stamped with this revision
+(`alembic stamp 0001`) before running `alembic upgrade head`. The tables
+added since then come from later revisions.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+MUSCLE_GROUPS = ("CHEST", "BACK", "LEGS", "SHOULDERS", "ARMS", "CORE", "CARDIO")
+
+
+def upgrade() -> None:
+    muscle_group = postgresql.ENUM(*MUSCLE_GROUPS, name="musclegroup", create_type=False)
+    muscle_group.create(op.get_bind(), checkfirst=True)
+
+    op.create_table(
+        "users",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("username", sa.String(), nullable=False),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("full_name", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+
+    op.create_table(
+        "workouts",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("date", sa.Date(), nullable=False),
+        sa.Column("notes", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_workouts_date", "workouts", ["date"])
+
+    op.create_table(
+        "exercises",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("workout_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("workouts.id"), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("muscle_group", muscle_group, nullable=False),
+        sa.Column("sets", sa.Integer(), nullable=False),
+        sa.Column("reps", sa.Integer(), nullable=False),
+        sa.Column("weight", sa.Integer(), nullable=True),
+        sa.Column("notes", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("exercises")
+    op.drop_index("ix_workouts_date", table_name="workouts")
+    op.drop_table("workouts")
+    op.drop_index("ix_users_username", table_name="users")
+    op.drop_index("ix_users_email", table_name="users")
+    op.drop_table("users")
+    postgresql.ENUM(name="musclegroup").drop(op.get_bind(), checkfirst=True)
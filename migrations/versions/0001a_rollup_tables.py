@@ -0,0 +1,62 @@
+"""Rollup, streak and data version tables
+
+- daily_stats: exercise count and volume per user, day and muscle group,
+  backfilled from the existing exercises with the same totals as
+  app.services.rollup (`python -m app.cli rollup check` compares the two).
+- user_streaks: computed per user on first use, so it starts empty.
+- user_data_versions: a missing row reads as version 0, so it starts empty.
+
+Revision ID: 0001a
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0001a"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+MUSCLE_GROUPS = ("CHEST", "BACK", "LEGS", "SHOULDERS", "ARMS", "CORE", "CARDIO")
+
+
+def upgrade() -> None:
+    muscle_group = postgresql.ENUM(*MUSCLE_GROUPS, name="musclegroup", create_type=False)
+
+    op.create_table(
+        "daily_stats",
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("date", sa.Date(), primary_key=True),
+        sa.Column("muscle_group", muscle_group, primary_key=True),
+        sa.Column("exercise_count", sa.Integer(), nullable=False),
+        sa.Column("volume", sa.Integer(), nullable=False),
+    )
+    op.execute("""
+        INSERT INTO daily_stats (user_id, date, muscle_group, exercise_count, volume)
+        SELECT w.user_id, w.date, e.muscle_group, count(*), sum(e.sets * e.reps)
+        FROM exercises e
+        JOIN workouts w ON w.id = e.workout_id
+        GROUP BY w.user_id, w.date, e.muscle_group
+    """)
+
+    op.create_table(
+        "user_streaks",
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("run_start", sa.Date(), nullable=True),
+        sa.Column("run_end", sa.Date(), nullable=True),
+        sa.Column("longest_streak", sa.Integer(), nullable=False),
+    )
+
+    op.create_table(
+        "user_data_versions",
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("version", sa.BigInteger(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("user_data_versions")
+    op.drop_table("user_streaks")
+    op.drop_table("daily_stats")
@@ -0,0 +1,57 @@
+"""Indexes for the per-user queries in the workouts, exercises and stats routers
+
+- workouts (user_id, date), unique: every workout query filters on user_id
+  and most on a date or date range. Also enforces one workout per day,
+  which create_workout and update_workout already check, and covers the
+  workouts.user_id foreign key. It replaces the standalone date index, which
+  no query can use without a user filter.
+- exercises (workout_id): the foreign key used by every exercise lookup and
+  by the selectin loads of Workout.exercises.
+
+Indexes are built CONCURRENTLY so existing tables stay writable. Creating the
+unique index fails if a user already has two workouts on the same day; those
+rows must be merged first. A failed CONCURRENTLY build leaves an INVALID
+index behind, which is dropped and rebuilt when the upgrade is run again.
+
+Revision ID: 0002
+Revises: 0001a
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001a"
+branch_labels = None
+depends_on = None
+
+
+def _drop_if_invalid(name: str, table: str) -> None:
+    invalid = op.get_bind().scalar(
+        sa.text("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"), {"name": name}
+    )
+    if invalid:
+        op.drop_index(name, table_name=table, postgresql_concurrently=True)
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        # if_not_exists would otherwise keep an invalid index from an earlier attempt
+        _drop_if_invalid("ix_workouts_user_id_date", "workouts")
+        _drop_if_invalid("ix_exercises_workout_id", "exercises")
+        op.create_index(
+            "ix_workouts_user_id_date", "workouts", ["user_id", "date"],
+            unique=True, postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            "ix_exercises_workout_id", "exercises", ["workout_id"],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.drop_index("ix_workouts_date", table_name="workouts", postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index("ix_workouts_date", "workouts", ["date"], postgresql_concurrently=True)
+        op.drop_index("ix_exercises_workout_id", table_name="exercises", postgresql_concurrently=True)
+        op.drop_index("ix_workouts_user_id_date", table_name="workouts", postgresql_concurrently=True)
@@ -0,0 +1,56 @@
+"""Personal records per user and exercise name
+
+Creates personal_records and backfills it from the existing exercises with
+the same aggregate app.services.records uses (`python -m app.cli records
+check` compares the two).
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "personal_records",
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("exercise_key", sa.String(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("max_weight", sa.Integer(), nullable=True),
+        sa.Column("max_weight_date", sa.Date(), nullable=True),
+        sa.Column("max_reps", sa.Integer(), nullable=False),
+        sa.Column("max_reps_date", sa.Date(), nullable=False),
+        sa.Column("max_volume", sa.Integer(), nullable=False),
+        sa.Column("max_volume_date", sa.Date(), nullable=False),
+        sa.Column("last_performed", sa.Date(), nullable=False),
+    )
+    op.execute(r"""
+        INSERT INTO personal_records
+        SELECT
+            w.user_id,
+            lower(btrim(regexp_replace(e.name, '\s+', ' ', 'g'))) AS exercise_key,
+            (array_agg(e.name ORDER BY w.date DESC, e.name))[1],
+            max(e.weight),
+            CASE WHEN max(e.weight) IS NULL THEN NULL
+                 ELSE (array_agg(w.date ORDER BY e.weight DESC NULLS LAST, w.date))[1] END,
+            max(e.reps),
+            (array_agg(w.date ORDER BY e.reps DESC NULLS LAST, w.date))[1],
+            max(e.sets * e.reps),
+            (array_agg(w.date ORDER BY e.sets * e.reps DESC NULLS LAST, w.date))[1],
+            max(w.date)
+        FROM exercises e
+        JOIN workouts w ON w.id = e.workout_id
+        GROUP BY w.user_id, exercise_key
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table("personal_records")
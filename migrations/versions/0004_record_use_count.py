@@ -0,0 +1,37 @@
+"""Exercise counts on personal_records, for name autocomplete
+
+Adds personal_records.use_count and backfills it from the existing
+exercises, grouped by the same key as the records themselves.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("personal_records", sa.Column("use_count", sa.Integer(), nullable=False, server_default="0"))
+    op.execute(r"""
+        UPDATE personal_records r
+        SET use_count = counts.use_count
+        FROM (
+            SELECT w.user_id, lower(btrim(regexp_replace(e.name, '\s+', ' ', 'g'))) AS exercise_key, count(*) AS use_count
+            FROM exercises e
+            JOIN workouts w ON w.id = e.workout_id
+            GROUP BY w.user_id, exercise_key
+        ) counts
+        WHERE r.user_id = counts.user_id AND r.exercise_key = counts.exercise_key
+    """)
+    # The app always writes use_count; the default only served existing rows
+    op.alter_column("personal_records", "use_count", server_default=None)
+
+
+def downgrade() -> None:
+    op.drop_column("personal_records", "use_count")
@@ -0,0 +1,47 @@
+"""Stored volume and tonnage on exercises, tonnage in daily_stats
+
+exercises.volume (sets * reps) and exercises.tonnage (sets * reps * weight,
+0 without a weight) are stored generated columns, so Postgres computes them
+for existing rows when they are added. That rewrites the exercises table
+under an ACCESS EXCLUSIVE lock, so run it in a maintenance window on large
+installations. daily_stats.tonnage is backfilled from the new column.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("exercises", sa.Column("volume", sa.Integer(), sa.Computed("sets * reps", persisted=True)))
+    op.add_column(
+        "exercises",
+        sa.Column("tonnage", sa.Integer(), sa.Computed("sets * reps * coalesce(weight, 0)", persisted=True)),
+    )
+    op.add_column("daily_stats", sa.Column("tonnage", sa.Integer(), nullable=False, server_default="0"))
+    op.execute("""
+        UPDATE daily_stats d
+        SET tonnage = totals.tonnage
+        FROM (
+            SELECT w.user_id, w.date, e.muscle_group, sum(e.tonnage) AS tonnage
+            FROM exercises e
+            JOIN workouts w ON w.id = e.workout_id
+            GROUP BY w.user_id, w.date, e.muscle_group
+        ) totals
+        WHERE d.user_id = totals.user_id AND d.date = totals.date AND d.muscle_group = totals.muscle_group
+    """)
+    # The app always writes tonnage; the default only served existing rows
+    op.alter_column("daily_stats", "tonnage", server_default=None)
+
+
+def downgrade() -> None:
+    op.drop_column("daily_stats", "tonnage")
+    op.drop_column("exercises", "tonnage")
+    op.drop_column("exercises", "volume")
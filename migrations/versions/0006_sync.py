@@ -0,0 +1,42 @@
+"""Change sequence on workouts and exercises, tombstones for deletions
+
+Adds sync_seq, the data version of the transaction that last wrote a row,
+to workouts and exercises, with an index for the workouts changed after a
+given version. Existing rows get 0, so they are only returned
+by a full sync. sync_tombstones records deleted rows for /sync.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    for table in ("workouts", "exercises"):
+        op.add_column(table, sa.Column("sync_seq", sa.BigInteger(), nullable=False, server_default="0"))
+        # The app always writes sync_seq; the default only served existing rows
+        op.alter_column(table, "sync_seq", server_default=None)
+    op.create_index("ix_workouts_user_id_sync_seq", "workouts", ["user_id", "sync_seq"])
+    op.create_table(
+        "sync_tombstones",
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("seq", sa.BigInteger(), primary_key=True),
+        sa.Column("entity_id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("entity", sa.String(), nullable=False),
+        sa.Column("deleted_at", sa.DateTime(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("sync_tombstones")
+    op.drop_index("ix_workouts_user_id_sync_seq", table_name="workouts")
+    for table in ("exercises", "workouts"):
+        op.drop_column(table, "sync_seq")